@@ -0,0 +1,101 @@
+"""create base tables
+
+Revision ID: 1a0c3e5b7d92
+Revises: 
+Create Date: 2024-11-03 08:40:12.514207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1a0c3e5b7d92'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# The tables as they were before 9fd893406721, which alters them and drops escrows.
+# Databases created before the migrations existed already have them and are stamped at
+# 9fd893406721 or later, this only runs on an empty database.
+def upgrade() -> None:
+    op.create_table('users',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('email', sa.String(), nullable=False),
+    sa.Column('first_name', sa.String(), nullable=False),
+    sa.Column('last_name', sa.String(), nullable=False),
+    sa.Column('hashed_password', sa.String(), nullable=False),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('is_verified', sa.Boolean(), nullable=True),
+    sa.Column('role', sa.Enum('BUYER', 'SELLER', 'ADMIN', name='userrole'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_users_email', 'users', ['email'], unique=True)
+    op.create_index('ix_users_id', 'users', ['id'], unique=False)
+    op.create_table('kyc',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('kyc_status', sa.Enum('PENDING', 'VERIFIED', 'REJECTED', name='kycstatus'), nullable=False),
+    sa.Column('document_type', sa.Enum('NIN', 'DRIVERS_LICENSE', 'INTERNATIONAL_PASSPORT', name='documenttype'), nullable=True),
+    sa.Column('document_id', sa.String(), nullable=False),
+    sa.Column('uploaded_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_kyc_id', 'kyc', ['id'], unique=False)
+    op.create_table('orders',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('item_name', sa.String(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('price', sa.DECIMAL(precision=10, scale=2), nullable=False),
+    sa.Column('status', sa.Enum('PENDING', 'IN_TRANSIT', 'DELIVERED', 'CANCELLED', name='orderstatus'), nullable=True),
+    sa.Column('tracking_id', sa.String(), nullable=False),
+    sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_orders_id', 'orders', ['id'], unique=False)
+    op.create_table('deliveries',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('order_id', sa.Integer(), nullable=True),
+    sa.Column('tracking_id', sa.String(), nullable=False),
+    sa.ForeignKeyConstraint(['order_id'], ['orders.id']),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('tracking_id')
+    )
+    op.create_index('ix_deliveries_id', 'deliveries', ['id'], unique=False)
+    op.create_table('escrows',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('buyer_id', sa.Integer(), nullable=True),
+    sa.Column('seller_id', sa.Integer(), nullable=True),
+    sa.Column('order_id', sa.Integer(), nullable=True),
+    sa.Column('amount', sa.NUMERIC(precision=10, scale=2), nullable=False),
+    sa.Column('is_released', sa.Boolean(), nullable=True),
+    sa.ForeignKeyConstraint(['buyer_id'], ['users.id']),
+    sa.ForeignKeyConstraint(['order_id'], ['orders.id']),
+    sa.ForeignKeyConstraint(['seller_id'], ['users.id']),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_escrows_id', 'escrows', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_escrows_id', table_name='escrows')
+    op.drop_table('escrows')
+    op.drop_index('ix_deliveries_id', table_name='deliveries')
+    op.drop_table('deliveries')
+    op.drop_index('ix_orders_id', table_name='orders')
+    op.drop_table('orders')
+    op.drop_index('ix_kyc_id', table_name='kyc')
+    op.drop_table('kyc')
+    op.drop_index('ix_users_id', table_name='users')
+    op.drop_index('ix_users_email', table_name='users')
+    op.drop_table('users')
+    sa.Enum(name='documenttype').drop(op.get_bind())
+    sa.Enum(name='kycstatus').drop(op.get_bind())
+    sa.Enum(name='orderstatus').drop(op.get_bind())
+    sa.Enum(name='userrole').drop(op.get_bind())
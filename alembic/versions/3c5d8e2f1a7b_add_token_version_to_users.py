@@ -0,0 +1,26 @@
+"""add token_version to users
+
+Revision ID: 3c5d8e2f1a7b
+Revises: 9fd893406721
+Create Date: 2026-10-18 09:12:27.114502
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c5d8e2f1a7b'
+down_revision: Union[str, None] = '9fd893406721'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('token_version', sa.Integer(), server_default=sa.text('0'), nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'token_version')
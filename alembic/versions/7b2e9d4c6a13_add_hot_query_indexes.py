@@ -0,0 +1,43 @@
+"""add hot query indexes
+
+Revision ID: 7b2e9d4c6a13
+Revises: a41f6c0b92de
+Create Date: 2026-10-18 11:20:07.318544
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7b2e9d4c6a13'
+down_revision: Union[str, None] = 'a41f6c0b92de'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+ACTIVE_ORDERS = sa.text("status IN ('PENDING', 'IN_TRANSIT')")
+
+
+def upgrade() -> None:
+    # CONCURRENTLY so orders/kyc/deliveries stay writable while the indexes build,
+    # which can't run inside the migration transaction
+    with op.get_context().autocommit_block():
+        op.create_index('ix_orders_user_id_created_at', 'orders', ['user_id', 'created_at', 'id'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_orders_created_at', 'orders', ['created_at', 'id'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_orders_active_status', 'orders', ['status', 'created_at'], unique=False, postgresql_where=ACTIVE_ORDERS, postgresql_concurrently=True)
+        op.create_index('ix_kyc_user_id', 'kyc', ['user_id'], unique=True, postgresql_concurrently=True)
+        op.create_index('ix_kyc_status_id', 'kyc', ['kyc_status', 'id'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_deliveries_order_id', 'deliveries', ['order_id'], unique=True, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_deliveries_order_id', table_name='deliveries', postgresql_concurrently=True)
+        op.drop_index('ix_kyc_status_id', table_name='kyc', postgresql_concurrently=True)
+        op.drop_index('ix_kyc_user_id', table_name='kyc', postgresql_concurrently=True)
+        op.drop_index('ix_orders_active_status', table_name='orders', postgresql_where=ACTIVE_ORDERS, postgresql_concurrently=True)
+        op.drop_index('ix_orders_created_at', table_name='orders', postgresql_concurrently=True)
+        op.drop_index('ix_orders_user_id_created_at', table_name='orders', postgresql_concurrently=True)
@@ -1,7 +1,7 @@
 """initial migration
 
 Revision ID: 9fd893406721
-Revises: 
+Revises: 1a0c3e5b7d92
 Create Date: 2024-11-03 08:55:41.098153
 
 """
@@ -13,7 +13,7 @@ import sqlalchemy as sa
 
 # revision identifiers, used by Alembic.
 revision: str = '9fd893406721'
-down_revision: Union[str, None] = None
+down_revision: Union[str, None] = '1a0c3e5b7d92'
 branch_labels: Union[str, Sequence[str], None] = None
 depends_on: Union[str, Sequence[str], None] = None
 
@@ -0,0 +1,45 @@
+"""add escrow outbox
+
+Revision ID: a41f6c0b92de
+Revises: 3c5d8e2f1a7b
+Create Date: 2026-10-18 10:03:51.402117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a41f6c0b92de'
+down_revision: Union[str, None] = '3c5d8e2f1a7b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('escrow_outbox',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('order_id', sa.Integer(), nullable=False),
+    sa.Column('operation', sa.Enum('HOLD', 'RELEASE', name='escrowoperation'), nullable=False),
+    sa.Column('amount', sa.DECIMAL(precision=10, scale=2), nullable=True),
+    sa.Column('status', sa.Enum('PENDING', 'DONE', 'FAILED', name='outboxstatus'), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('next_attempt_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('tx_id', sa.String(), nullable=True),
+    sa.Column('last_error', sa.String(), nullable=True),
+    sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['order_id'], ['orders.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_escrow_outbox_id', 'escrow_outbox', ['id'], unique=False)
+    op.create_index('ix_escrow_outbox_due', 'escrow_outbox', ['next_attempt_at'], unique=False, postgresql_where=sa.text("status = 'PENDING'"))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_escrow_outbox_due', table_name='escrow_outbox', postgresql_where=sa.text("status = 'PENDING'"))
+    op.drop_index('ix_escrow_outbox_id', table_name='escrow_outbox')
+    op.drop_table('escrow_outbox')
+    sa.Enum(name='outboxstatus').drop(op.get_bind())
+    sa.Enum(name='escrowoperation').drop(op.get_bind())
@@ -0,0 +1,29 @@
+"""index escrow outbox by order
+
+Revision ID: b6d1e3f5a7c9
+Revises: f2b8c4e6a1d3
+Create Date: 2026-10-18 18:12:07.530914
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6d1e3f5a7c9'
+down_revision: Union[str, None] = 'f2b8c4e6a1d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # the dispatcher checks each due release's hold, done and failed rows are never deleted
+    with op.get_context().autocommit_block():
+        op.create_index('ix_escrow_outbox_order_id', 'escrow_outbox', ['order_id', 'operation'], unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_escrow_outbox_order_id', table_name='escrow_outbox', postgresql_concurrently=True)
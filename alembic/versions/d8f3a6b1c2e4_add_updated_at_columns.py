@@ -0,0 +1,32 @@
+"""add updated_at columns
+
+Revision ID: d8f3a6b1c2e4
+Revises: 7b2e9d4c6a13
+Create Date: 2026-10-18 12:41:26.904153
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8f3a6b1c2e4'
+down_revision: Union[str, None] = '7b2e9d4c6a13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+TABLES = ('users', 'kyc', 'orders', 'deliveries')
+
+
+def upgrade() -> None:
+    # now() is evaluated once for the ALTER, so existing rows get the default without a table rewrite
+    for table in TABLES:
+        op.add_column(table, sa.Column('updated_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False))
+
+
+def downgrade() -> None:
+    for table in reversed(TABLES):
+        op.drop_column(table, 'updated_at')
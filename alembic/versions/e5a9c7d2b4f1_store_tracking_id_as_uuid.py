@@ -0,0 +1,36 @@
+"""store tracking_id as uuid
+
+Revision ID: e5a9c7d2b4f1
+Revises: d8f3a6b1c2e4
+Create Date: 2026-10-18 13:58:12.550831
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a9c7d2b4f1'
+down_revision: Union[str, None] = 'd8f3a6b1c2e4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # existing tracking ids are uuid4 text and keep their value, so links already sent out
+    # still resolve; the unique index is rebuilt at 16 bytes per key
+    op.alter_column('deliveries', 'tracking_id',
+               existing_type=sa.String(),
+               type_=sa.Uuid(),
+               existing_nullable=False,
+               postgresql_using='tracking_id::uuid')
+
+
+def downgrade() -> None:
+    op.alter_column('deliveries', 'tracking_id',
+               existing_type=sa.Uuid(),
+               type_=sa.String(),
+               existing_nullable=False,
+               postgresql_using='tracking_id::text')
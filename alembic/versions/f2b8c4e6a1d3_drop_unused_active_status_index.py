@@ -0,0 +1,33 @@
+"""drop unused active status index
+
+Revision ID: f2b8c4e6a1d3
+Revises: e5a9c7d2b4f1
+Create Date: 2026-10-18 16:05:41.208316
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2b8c4e6a1d3'
+down_revision: Union[str, None] = 'e5a9c7d2b4f1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+ACTIVE_ORDERS = sa.text("status IN ('PENDING', 'IN_TRANSIT')")
+
+
+def upgrade() -> None:
+    # no query filters orders by status (delivery listings go through deliveries.order_id),
+    # the index only cost writes on every status change
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_orders_active_status', table_name='orders', postgresql_where=ACTIVE_ORDERS, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index('ix_orders_active_status', 'orders', ['status', 'created_at'], unique=False, postgresql_where=ACTIVE_ORDERS, postgresql_concurrently=True)
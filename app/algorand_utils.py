@@ -1,83 +1,320 @@
+"""Algorand escrow client
+
+One long-lived client per process talks to algod for the escrow contract:
+
+- configuration comes from the environment (ALGOD_ADDRESS, ALGOD_TOKEN, ALGOD_HEADERS,
+  ESCROW_APP_ID, ESCROW_MNEMONIC or ESCROW_PRIVATE_KEY); a missing app id or signing
+  key fails the first escrow call instead of sending bad transactions
+- HTTP goes through a pooled httpx client, so calls reuse keep-alive connections
+  instead of opening a new one per request like the stock AlgodClient
+- suggested params are cached for ALGOD_PARAMS_TTL seconds. They stay valid for 1000
+  rounds, so a call normally costs one round trip (the submission) instead of two
+- AsyncEscrowClient is created lazily on first use
+- every hold and release carries a lease derived from the order id, so algod rejects
+  a retry of one that already landed (within its validity window) instead of
+  calling the contract twice
+- EscrowBatcher sits on top of the async client and coalesces calls made within
+  ESCROW_BATCH_WINDOW into atomic groups of up to ESCROW_GROUP_SIZE transactions
+"""
 # import algosdk
-from fastapi import HTTPException
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import time
+
+import httpx
+from dotenv import load_dotenv
+from algosdk import account, constants, encoding, mnemonic, transaction
 from algosdk.error import AlgodHTTPError
 from algosdk.v2client import algod
 from algosdk.transaction import ApplicationNoOpTxn
-# from algosdk import account, mnemonic
+
+load_dotenv()
 
 # Algod client setup
-ALGOD_TOKEN = "Algod Token"
-ALGOD_ADDRESS = "https://testnet-algorand.api.purestake.io/ps2"  # Testnet URL
-client = algod.AlgodClient(ALGOD_TOKEN, ALGOD_ADDRESS)
+ALGOD_ADDRESS = os.getenv("ALGOD_ADDRESS", "https://testnet-algorand.api.purestake.io/ps2")  # Testnet URL
+ALGOD_TOKEN = os.getenv("ALGOD_TOKEN", "")
+# extra headers for hosted providers, e.g. {"X-API-Key": "..."}
+ALGOD_HEADERS = json.loads(os.getenv("ALGOD_HEADERS") or "{}")
+ALGOD_TIMEOUT = float(os.getenv("ALGOD_TIMEOUT", "10"))
+ALGOD_MAX_CONNECTIONS = int(os.getenv("ALGOD_MAX_CONNECTIONS", "20"))
+ALGOD_PARAMS_TTL = float(os.getenv("ALGOD_PARAMS_TTL", "30"))
+ESCROW_BATCH_WINDOW = float(os.getenv("ESCROW_BATCH_WINDOW", "0.05"))
+# 16 is the protocol's limit for an atomic transaction group
+ESCROW_GROUP_SIZE = min(int(os.getenv("ESCROW_GROUP_SIZE", "16")), 16)
+
+# deployed smart contract ID
+ESCROW_APP_ID = os.getenv("ESCROW_APP_ID")
+ESCROW_MNEMONIC = os.getenv("ESCROW_MNEMONIC")
+ESCROW_PRIVATE_KEY = os.getenv("ESCROW_PRIVATE_KEY")
+
 
 # Load Algorand account
 def get_account():
-    private_key = "Private Key"
-    account_address = "Algorand Address"
+    private_key = ESCROW_PRIVATE_KEY
+    if ESCROW_MNEMONIC:
+        private_key = mnemonic.to_private_key(ESCROW_MNEMONIC)
+    if not private_key:
+        raise RuntimeError("ESCROW_MNEMONIC or ESCROW_PRIVATE_KEY must be set to sign escrow transactions")
+    account_address = account.address_from_private_key(private_key)
     return private_key, account_address
 
-# Function to initiate escrow hold in the smart contract
-def initiate_escrow_hold(order_id: int, amount: float):
-    private_key, sender_address = get_account()
-    
-    # deployed smart contract ID
-    app_id = "Smart Contract App ID"
-    
-    # Create a transaction to call the smart contract for an escrow hold
-    params = client.suggested_params()
-    txn = ApplicationNoOpTxn(sender_address, params, app_id, app_args=["hold_funds", order_id, amount])
-    
-    # Sign and send transaction
-    signed_txn = txn.sign(private_key)
-    tx_id = client.send_transaction(signed_txn)
-    return tx_id
-
-# # Function to release funds on delivery confirmation
-# def release_escrow(order_id: int):
-#     private_key, sender_address = get_account()
-    
-#     # deployed smart contract ID
-#     app_id = "Smart Contract App ID"
-    
-#     # Transaction to release funds
-#     params = client.suggested_params()
-#     txn = ApplicationNoOpTxn(sender_address, params, app_id, app_args=["release_funds", order_id])
-    
-#     # Sign and send transaction
-#     signed_txn = txn.sign(private_key)
-#     tx_id = client.send_transaction(signed_txn)
-#     return tx_id
-
-def release_escrow(order_id: int) -> str:
-    try:
-        # Get account credentials
-        private_key, sender_address = get_account()
-        
-        # Deployed smart contract ID
-        app_id = "Smart Contract App ID"
-        
-        # Prepare the transaction
-        params = client.suggested_params()
-        txn = ApplicationNoOpTxn(
-            sender=sender_address, 
-            sp=params, 
-            index=app_id, 
-            app_args=["release_funds", order_id]  # Ensure order_id format is correct
+
+# app id 0 means "create an application", never fall back to it
+def get_app_id():
+    if not ESCROW_APP_ID or int(ESCROW_APP_ID) == 0:
+        raise RuntimeError("ESCROW_APP_ID must be set to the id of the deployed escrow contract")
+    return int(ESCROW_APP_ID)
+
+
+def _algod_path(requrl: str):
+    if requrl in constants.unversioned_paths:
+        return requrl
+    return algod.api_version_path_prefix + requrl
+
+
+def _algod_response(resp: httpx.Response, response_format: str = "json"):
+    if resp.status_code >= 400:
+        try:
+            body = resp.json()
+            message = body.get("message", resp.text)
+            data = body.get("data")
+        except ValueError:
+            message, data = resp.text, None
+        raise AlgodHTTPError(message, resp.status_code, data)
+
+    if response_format != "json":
+        return resp.content
+    # some algod endpoints answer 200 with an empty body
+    return resp.json() if resp.content else {}
+
+
+# a rejection one bad transaction can cause, as opposed to algod being overloaded or down
+def _is_rejection(error: AlgodHTTPError):
+    return error.code is not None and 400 <= error.code < 500 and error.code != 429
+
+
+def _suggested_params(res: dict):
+    return transaction.SuggestedParams(
+        res["fee"],
+        res["last-round"],
+        res["last-round"] + 1000,
+        res["genesis-hash"],
+        res["genesis-id"],
+        False,
+        res["consensus-version"],
+        res["min-fee"],
+    )
+
+
+class AsyncEscrowClient:
+    def __init__(self, algod_address: str = ALGOD_ADDRESS, algod_token: str = ALGOD_TOKEN, headers: dict | None = None, app_id: int | None = None, params_ttl: float = ALGOD_PARAMS_TTL):
+        self.algod_address = algod_address
+        self.algod_token = algod_token
+        self.headers = ALGOD_HEADERS if headers is None else headers
+        self.app_id = app_id or get_app_id()
+        # derived once, not for every transaction on the event loop
+        self.private_key, self.address = get_account()
+        self.params_ttl = params_ttl
+        self._params = None
+        self._params_expire_at = 0.0
+        self.http = httpx.AsyncClient(
+            timeout=ALGOD_TIMEOUT,
+            limits=httpx.Limits(max_connections=ALGOD_MAX_CONNECTIONS, max_keepalive_connections=ALGOD_MAX_CONNECTIONS),
         )
-        
-        # Sign and send the transaction
-        signed_txn = txn.sign(private_key)
-        tx_id = client.send_transaction(signed_txn)
-
-        # Optional: You could wait for confirmation if needed
-        # transaction_response = client.pending_transaction_info(tx_id)
-        
-        return tx_id  # Return transaction ID for reference
-
-    except AlgodHTTPError as e:
-        print(f"Algorand client error: {e}")
-        raise HTTPException(status_code=500, detail=f"Failed to release escrow funds: {str(e)}")
-    
-    except Exception as e:
-        print(f"Unexpected error: {e}")
-        raise HTTPException(status_code=500, detail="An unexpected error occurred while releasing escrow funds.")
\ No newline at end of file
+        self._lock = asyncio.Lock()
+
+    async def algod_request(self, method: str, requrl: str, data=None, headers=None, timeout: float | None = None):
+        resp = await self.http.request(
+            method,
+            self.algod_address + _algod_path(requrl),
+            content=data,
+            headers=self._headers(requrl, headers),
+            timeout=httpx.USE_CLIENT_DEFAULT if timeout is None else timeout,
+        )
+        return _algod_response(resp)
+
+    def _headers(self, requrl: str, headers=None):
+        header = {"User-Agent": "py-algorand-sdk", **self.headers}
+        if headers:
+            header.update(headers)
+        if requrl not in constants.no_auth:
+            header[constants.algod_auth_header] = self.algod_token
+        return header
+
+    def _cached_params(self):
+        if self._params is not None and time.monotonic() < self._params_expire_at:
+            return self._params
+        return None
+
+    def _cache_params(self, params):
+        self._params = params
+        self._params_expire_at = time.monotonic() + self.params_ttl
+        return params
+
+    def invalidate_params(self):
+        self._params = None
+
+    async def suggested_params(self):
+        # concurrent callers wait for one refresh instead of each fetching
+        async with self._lock:
+            params = self._cached_params()
+            if params is None:
+                params = self._cache_params(_suggested_params(await self.algod_request("GET", "/transactions/params")))
+            return params
+
+    def _call_txn(self, params, app_args, lease: bytes):
+        return ApplicationNoOpTxn(sender=self.address, sp=params, index=self.app_id, app_args=app_args, lease=lease)
+
+    def _lease(self, operation: str, order_id: int):
+        # 32 bytes, the same for every attempt at the same operation
+        return hashlib.sha256(f"{self.app_id}:{operation}:{order_id}".encode()).digest()
+
+    def _sign(self, txn):
+        return txn.sign(self.private_key)
+
+    # Decimal is not a valid app arg, the amount goes over as its exact string form
+    def _hold_call(self, params, order_id: int, amount):
+        return self._call_txn(params, ["hold_funds", order_id, str(amount)], self._lease("hold", order_id))
+
+    def _release_call(self, params, order_id: int):
+        return self._call_txn(params, ["release_funds", order_id], self._lease("release", order_id))
+
+    async def send_transactions(self, signed_txns):
+        data = b"".join(base64.b64decode(encoding.msgpack_encode(txn)) for txn in signed_txns)
+        try:
+            res = await self.algod_request("POST", "/transactions", data=data, headers={"Content-Type": "application/x-binary"})
+        except AlgodHTTPError:
+            # the cached params may be what got rejected, refetch them on the next call
+            self.invalidate_params()
+            raise
+        return res["txId"]
+
+    async def health(self):
+        await self.algod_request("GET", "/health")
+
+    async def hold(self, order_id: int, amount):
+        return await self.send_transactions([self._sign(self._hold_call(await self.suggested_params(), order_id, amount))])
+
+    async def release(self, order_id: int):
+        return await self.send_transactions([self._sign(self._release_call(await self.suggested_params(), order_id))])
+
+    async def close(self):
+        await self.http.aclose()
+
+
+class EscrowBatcher:
+    """Submits escrow calls as atomic transaction groups.
+
+    Callers await hold()/release() as if each were sent on its own. Calls arriving
+    within `window` seconds of each other are grouped, up to `group_size` per group,
+    and each caller gets back the id of its own transaction in the group. A group
+    rejected as invalid (a 4xx other than 429) is split and its calls resubmitted one
+    by one, so a single bad call fails alone instead of taking its neighbours with it.
+    When algod is overloaded or failing (429, 5xx) the whole group fails instead, and
+    callers retry it later rather than sending every call again right away.
+    """
+
+    def __init__(self, client: AsyncEscrowClient, window: float = ESCROW_BATCH_WINDOW, group_size: int = ESCROW_GROUP_SIZE):
+        self.client = client
+        self.window = window
+        self.group_size = group_size
+        self._pending = []
+        self._timer = None
+        self._tasks = set()
+
+    async def hold(self, order_id: int, amount):
+        return await self._enqueue(lambda params: self.client._hold_call(params, order_id, amount))
+
+    async def release(self, order_id: int):
+        return await self._enqueue(lambda params: self.client._release_call(params, order_id))
+
+    def _enqueue(self, build_txn):
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((build_txn, future))
+
+        if len(self._pending) >= self.group_size:
+            self._submit(self._take_group())
+        if self._pending and self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._flush)
+        return future
+
+    def _take_group(self):
+        group = self._pending[:self.group_size]
+        del self._pending[:self.group_size]
+        return group
+
+    def _flush(self):
+        self._timer = None
+        while self._pending:
+            self._submit(self._take_group())
+
+    def _submit(self, group):
+        task = asyncio.create_task(self._send_group(group))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send_group(self, group):
+        try:
+            params = await self.client.suggested_params()
+            txns = [build_txn(params) for build_txn, _ in group]
+            if len(txns) > 1:
+                transaction.assign_group_id(txns)
+            await self.client.send_transactions([self.client._sign(txn) for txn in txns])
+        except AlgodHTTPError as e:
+            if len(group) > 1 and _is_rejection(e):
+                for item in group:
+                    self._submit([item])
+                return
+            self._fail(group, e)
+        except Exception as e:
+            self._fail(group, e)
+        else:
+            # the group id is part of every transaction, so ids are only final now
+            for (_, future), txn in zip(group, txns):
+                if not future.done():
+                    future.set_result(txn.get_txid())
+
+    def _fail(self, group, error: Exception):
+        for _, future in group:
+            if not future.done():
+                future.set_exception(error)
+
+    async def close(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._fail(self._pending, RuntimeError("Escrow batcher closed"))
+        self._pending = []
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+_async_escrow_client = None
+_escrow_batcher = None
+
+
+def get_async_escrow_client():
+    global _async_escrow_client
+    if _async_escrow_client is None:
+        _async_escrow_client = AsyncEscrowClient()
+    return _async_escrow_client
+
+
+def get_escrow_batcher():
+    global _escrow_batcher
+    if _escrow_batcher is None:
+        _escrow_batcher = EscrowBatcher(get_async_escrow_client())
+    return _escrow_batcher
+
+
+async def close_clients():
+    global _async_escrow_client, _escrow_batcher
+    if _escrow_batcher is not None:
+        await _escrow_batcher.close()
+        _escrow_batcher = None
+    if _async_escrow_client is not None:
+        await _async_escrow_client.close()
+        _async_escrow_client = None
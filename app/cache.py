@@ -0,0 +1,86 @@
+import os
+import time
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+TOKEN_VERSION_CACHE_TTL = float(os.getenv("TOKEN_VERSION_CACHE_TTL", "30"))
+TRACKING_CACHE_TTL = float(os.getenv("TRACKING_CACHE_TTL", "30"))
+TRACKING_CACHE_SIZE = int(os.getenv("TRACKING_CACHE_SIZE", "10000"))
+
+
+class TTLCache:
+    """Bounded in-process cache: least recently used entries are evicted once
+    `maxsize` is reached, and every entry expires `ttl` seconds after it was set.
+
+    Only touched from the event loop, so no locking is needed. Every worker
+    process holds its own copy; explicit invalidation only reaches the local
+    one, the TTL bounds how stale the others can get.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        # bumped by every invalidation, a read-through fill that started before one
+        # may hold data older than the change and must not be stored
+        self.generation = 0
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        self.generation += 1
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+
+# authenticated principals, keyed by token subject (the user's email)
+principal_cache = TTLCache(PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL)
+
+
+# current token_version per user id, checked against the `ver` claim
+token_version_cache = TTLCache(PRINCIPAL_CACHE_SIZE, TOKEN_VERSION_CACHE_TTL)
+
+
+# serialized DeliveryResponse JSON per tracking code, dropped whenever a delivery change is published
+tracking_cache = TTLCache(TRACKING_CACHE_SIZE, TRACKING_CACHE_TTL)
+
+
+def invalidate_principal(*emails: str):
+    for email in emails:
+        principal_cache.invalidate(email)
+
+
+def invalidate_token_version(user_id: int):
+    token_version_cache.invalidate(user_id)
@@ -1,15 +1,29 @@
-from sqlalchemy.orm import Session
+from uuid import UUID
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import contains_eager, joinedload, raiseload
 from app import models
 from app import schema
 from app.crud import order as order_crud
 from app.utils import generate_tracking_id
+from app.pagination import paginate
 
 
-def create_delivery(payload: schema.DeliveryCreate, order_id: int, db: Session):
+# DeliveryResponse nests the order, which can't be lazy loaded under asyncio (and would be
+# one query per row if it could), so every query states what it loads. Anything else
+# raises on access instead of quietly issuing another SELECT.
+NO_LAZY_LOADS = raiseload("*")
+# single deliveries: order joined into the same query
+WITH_ORDER = (joinedload(models.Delivery.order).raiseload("*"), NO_LAZY_LOADS)
+# listings already join orders to filter on status, populate the relationship from that join
+WITH_JOINED_ORDER = (contains_eager(models.Delivery.order).raiseload("*"), NO_LAZY_LOADS)
+
+
+async def create_delivery(payload: schema.DeliveryCreate, order_id: int, db: AsyncSession):
     # generate tracking id for delivery
     tracking_id = generate_tracking_id()
 
-    order = order_crud.get_order_by_id(order_id, db)
+    order = await order_crud.get_order_by_id(order_id, db)
     if not order:
         return False
     
@@ -19,35 +33,35 @@ def create_delivery(payload: schema.DeliveryCreate, order_id: int, db: Session):
     order.status = schema.OrderStatus.PENDING
 
     db.add(delivery)
-    db.commit()
-    db.refresh(delivery)
+    await db.commit()
+    await db.refresh(delivery)
     return delivery
 
 #get delivery by order_id
-def get_delivery_by_order_id(order_id: int, db: Session):
-    delivery = db.query(models.Delivery).filter(models.Delivery.order_id == order_id).first()
+async def get_delivery_by_order_id(order_id: int, db: AsyncSession):
+    delivery = await db.scalar(select(models.Delivery).options(NO_LAZY_LOADS).filter(models.Delivery.order_id == order_id))
     if not delivery:
         return False
     return delivery
 
 #list pending orders
-def get_pending_delivery(order_id: int, skip: int, limit: int, db: Session):
-    order = order_crud.get_order_by_id(order_id, db)
+async def get_pending_delivery(order_id: int, cursor: str | None, limit: int, db: AsyncSession):
+    order = await order_crud.get_order_by_id(order_id, db)
     if not order:
         return False
-    pending_order =  db.query(models.Order).join(models.Order).filter(models.Delivery.order_id == order.id, models.Order.status == schema.OrderStatus.PENDING).offset(skip).limit(limit).all()
+    pending_order = select(models.Delivery).join(models.Delivery.order).options(*WITH_JOINED_ORDER).filter(models.Delivery.order_id == order.id, models.Order.status == schema.OrderStatus.PENDING)
 
-    return pending_order
+    return await paginate(db, pending_order, [models.Delivery.id], cursor, limit)
 
 #list delivered orders on transit
-def get_in_transit_delivery(skip: int, limit: int, order_id: int, db: Session):
-    order = order_crud.get_order_by_id(order_id, db)
+async def get_in_transit_delivery(order_id: int, cursor: str | None, limit: int, db: AsyncSession):
+    order = await order_crud.get_order_by_id(order_id, db)
     if not order:
         return False
-    order_in_transit =  db.query(models.Delivery).join(models.Order).filter(models.Delivery.order_id == order.id, models.Order.status == schema.OrderStatus.IN_TRANSIT).offset(skip).limit(limit).all()
+    order_in_transit = select(models.Delivery).join(models.Delivery.order).options(*WITH_JOINED_ORDER).filter(models.Delivery.order_id == order.id, models.Order.status == schema.OrderStatus.IN_TRANSIT)
 
-    return order_in_transit
+    return await paginate(db, order_in_transit, [models.Delivery.id], cursor, limit)
 
 #track order's delivery status
-def get_delivery_status(tracking_id: str, db: Session):
-    return db.query(models.Delivery).filter(models.Delivery.tracking_id == tracking_id).first()
\ No newline at end of file
+async def get_delivery_status(tracking_id: UUID, db: AsyncSession):
+    return await db.scalar(select(models.Delivery).options(*WITH_ORDER).filter(models.Delivery.tracking_id == tracking_id))
@@ -1,50 +1,76 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from app import schema
 from app import models
 from app.crud import user as user_crud
+from app.loader import load
+from app.projection import paginate_rows, select_for
 
 #creating a new kyc record
-def create_kyc(user_id: int, payload: schema.KYCCreate, db: Session):
-    user = user_crud.get_user(user_id, db)
+async def create_kyc(user_id: int, payload: schema.KYCCreate, db: AsyncSession):
+    user = await user_crud.get_user(user_id, db)
     if not user:
         return False
     kyc_data = models.KYC(**payload.model_dump(), user_id = user_id)
 
     db.add(kyc_data)
-    db.commit()
-    db.refresh(kyc_data)
+    await db.commit()
+    await db.refresh(kyc_data)
     return kyc_data
 
-# getting all kyc records from the database
-def get_kyc_records(skip: int, limit: int, db: Session):
-    return db.query(models.KYC).offset(skip).limit(limit).all()
+# getting all kyc records from the database, ends the session's current transaction
+async def get_kyc_records(cursor: str | None, limit: int, db: AsyncSession):
+    return await paginate_rows(db, select_for(models.KYC, schema.KYC), [models.KYC.id], cursor, limit)
 
 # getting a kyc record by id
-def get_kyc_record(kyc_id: int, db:Session):
-    return db.query(models.KYC).filter(models.KYC.id == kyc_id).first()
+async def get_kyc_record(kyc_id: int, db: AsyncSession):
+    return await load(db, models.KYC, kyc_id)
 
 # getting a kyc record by user id
-def get_user_kyc_record(user_id: int, db: Session):
-    return db.query(models.KYC).filter(models.KYC.user_id == user_id).first()
+async def get_user_kyc_record(user_id: int, db: AsyncSession):
+    return await db.scalar(select(models.KYC).filter(models.KYC.user_id == user_id))
+
+# id and updated_at of the user's kyc record for ETags, without loading the row
+async def get_user_kyc_version(user_id: int, db: AsyncSession):
+    return (await db.execute(select(models.KYC.id, models.KYC.updated_at).filter(models.KYC.user_id == user_id))).first()
+
+# updating the status of many kyc records with one UPDATE, and their users' is_verified
+# flags with a second one in the same transaction. Returns the updated kyc ids
+async def update_kyc_statuses(kyc_status: schema.KYCStatus, db: AsyncSession, kyc_ids: list[int] | None = None, current_status: schema.KYCStatus | None = None):
+    stmt = update(models.KYC).values(kyc_status=kyc_status).returning(models.KYC.id, models.KYC.user_id)
+    if kyc_ids is not None:
+        stmt = stmt.filter(models.KYC.id.in_(kyc_ids))
+    if current_status is not None:
+        stmt = stmt.filter(models.KYC.kyc_status == current_status)
+    updated = (await db.execute(stmt)).all()
+
+    user_ids = [row.user_id for row in updated if row.user_id is not None]
+    if user_ids:
+        await db.execute(
+            update(models.User)
+            .filter(models.User.id.in_(user_ids))
+            .values(is_verified=kyc_status == schema.KYCStatus.VERIFIED)
+        )
+
+    await db.commit()
+    return [row.id for row in updated]
 
 # updating the kyc status
-def update_kyc_status(kyc_id: int, payload: schema.KYCUpdate, db: Session):
-    kyc_record = get_kyc_record(kyc_id, db)
+async def update_kyc_status(kyc_id: int, payload: schema.KYCUpdate, db: AsyncSession):
+    kyc_record = await get_kyc_record(kyc_id, db)
     if not kyc_record:
         return False
     
-    kyc_record.kyc_status = payload.kyc_status
-    db.commit()
-    db.refresh(kyc_record)
+    await update_kyc_statuses(payload.kyc_status, db, kyc_ids=[kyc_id])
     return kyc_record
 
 # deleting a kyc record
-def delete_kyc_record(kyc_id: int, db: Session):
-    kyc = get_kyc_record(kyc_id, db)
+async def delete_kyc_record(kyc_id: int, db: AsyncSession):
+    kyc = await get_kyc_record(kyc_id, db)
 
     if not kyc:
         return False
     
-    db.delete(kyc)
-    db.commit()
-    return kyc
\ No newline at end of file
+    await db.delete(kyc)
+    await db.commit()
+    return kyc
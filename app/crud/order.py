@@ -1,45 +1,119 @@
-from fastapi import HTTPException
-from sqlalchemy.orm import Session
-from app.algorand_utils import initiate_escrow_hold
-from app.models import Order
-from app.schema import OrderCreate, OrderStatus, OrderStatusUpdate
+from datetime import datetime
+from decimal import Decimal
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import raiseload
+from app import events, outbox
+from app.loader import load
+from app.models import Delivery, Order
+from app.projection import paginate_rows, select_for
+from app.schema import Order as OrderSchema, OrderBulkItemResult, OrderCreate, OrderStatus, OrderStatusUpdate
 
 
-def create_order(payload: OrderCreate, user_id: int, db: Session):
+async def create_order(payload: OrderCreate, user_id: int, db: AsyncSession):
 
     # Create order in the database
     order = Order(**payload.model_dump(), user_id=user_id)
     db.add(order)
-    db.flush()  # Retrieve the new order ID for the escrow setup
+    await db.flush()  # Retrieve the new order ID for the escrow setup
 
-    # Call Algorand to initiate escrow
-    try:
-        escrow_tx_id = initiate_escrow_hold(order.id, order.price)
-        print(f"Escrow hold transaction ID: {escrow_tx_id}")
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(status_code=400, detail=f"Failed to initiate escrow: {str(e)}")
-
-    db.commit()
-    db.refresh(order)
+    # The escrow hold is committed together with the order and sent to Algorand by the outbox dispatcher
+    outbox.enqueue_hold(order, db)
+
+    await db.commit()
+    await db.refresh(order)
     return order
 
-#list user orders
-def get_orders(skip: int, limit: int, db: Session):
-    return db.query(Order).offset(skip).limit(limit).all()
+# largest price orders.price (DECIMAL(10, 2)) holds, a bigger one would fail the whole bulk insert
+MAX_PRICE = Decimal("99999999.99")
+# largest quantity orders.quantity (INTEGER) holds, for the same reason
+MAX_QUANTITY = 2**31 - 1
+
+
+def validate_bulk_item(item):
+    try:
+        payload = OrderCreate.model_validate(item)
+    except ValidationError as e:
+        return None, "; ".join(f"{'.'.join(map(str, err['loc'])) or 'item'}: {err['msg']}" for err in e.errors())
+
+    if payload.quantity <= 0 or payload.quantity > MAX_QUANTITY:
+        return None, f"quantity: must be greater than 0 and at most {MAX_QUANTITY}"
+    if payload.price <= 0 or payload.price > MAX_PRICE or payload.price.as_tuple().exponent < -2:
+        return None, f"price: must be greater than 0, at most {MAX_PRICE} and have at most 2 decimal places"
+    return payload, None
+
+
+# Creates the valid items with one multi-row INSERT ... RETURNING and their escrow holds
+# in the same transaction, invalid items are reported back by index
+async def create_orders_bulk(items: list, user_id: int, db: AsyncSession):
+    results = []
+    valid = []
+    for index, item in enumerate(items):
+        payload, error = validate_bulk_item(item)
+        if error:
+            results.append(OrderBulkItemResult(index=index, error=error))
+        else:
+            valid.append((index, payload))
+
+    if valid:
+        orders = await db.scalars(
+            insert(Order).returning(Order, sort_by_parameter_order=True),
+            [{**payload.model_dump(), "user_id": user_id} for _, payload in valid],
+        )
+        orders = orders.all()
+        outbox.enqueue_holds(orders, db)
+        await db.commit()
+        results.extend(OrderBulkItemResult(index=index, order=order) for (index, _), order in zip(valid, orders))
+
+    results.sort(key=lambda result: result.index)
+    return results
+
+# Order responses carry no relationships, refuse lazy loads of user/delivery rather
+# than let a caller turn a listing into one query per row
+NO_LAZY_LOADS = raiseload("*")
+
+# orders page oldest first, id breaks ties between equal timestamps
+ORDER_PAGE_KEYS = [Order.created_at, Order.id]
+
+#list all orders, read-only rows of the schema.Order columns. Ends the session's current transaction
+async def get_orders(cursor: str | None, limit: int, db: AsyncSession):
+    return await paginate_rows(db, select_for(Order, OrderSchema), ORDER_PAGE_KEYS, cursor, limit)
     
 
-# list user orders
-def get_user_orders(user_id: int, skip: int, limit: int, db: Session):
-    return db.query(Order).filter(Order.user_id == user_id).offset(skip).limit(limit).all()
+# list user orders, rows also carry updated_at for the page's ETag. Ends the session's current transaction
+async def get_user_orders(user_id: int, cursor: str | None, limit: int, db: AsyncSession):
+    stmt = select_for(Order, OrderSchema).add_columns(Order.updated_at).filter(Order.user_id == user_id)
+    return await paginate_rows(db, stmt, ORDER_PAGE_KEYS, cursor, limit)
+
+# one row per order with its delivery and escrow state, if it has a delivery yet
+EXPORT_COLUMNS = (
+    Order.id, Order.user_id, Order.item_name, Order.quantity, Order.price, Order.status, Order.created_at,
+    Delivery.tracking_id, Delivery.delivery_address, Delivery.delivery_date, Delivery.escrow_status,
+)
+# rows fetched per round trip from the server-side cursor
+EXPORT_BATCH_SIZE = 1000
+
+# streams the export in batches of rows through a server-side cursor, so memory stays flat
+# however many orders match. Plain column rows, no ORM objects
+async def stream_orders_export(db: AsyncSession, since: datetime | None = None, until: datetime | None = None):
+    stmt = select(*EXPORT_COLUMNS).outerjoin(Delivery, Delivery.order_id == Order.id).order_by(*ORDER_PAGE_KEYS)
+    if since is not None:
+        stmt = stmt.filter(Order.created_at >= since)
+    if until is not None:
+        stmt = stmt.filter(Order.created_at < until)
 
-#get order by id
-def get_order_by_id(order_id: int, db: Session):
-    return db.query(Order).filter(Order.id == order_id).first()
+    result = await db.stream(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+    async for rows in result.partitions():
+        yield rows
+
+#get order by id, reuses the order if this request already loaded it
+async def get_order_by_id(order_id: int, db: AsyncSession):
+    return await load(db, Order, order_id, NO_LAZY_LOADS)
 
 #cancel order
-def cancel_order(order_id: int, db: Session):
-    order = get_order_by_id(order_id, db)
+async def cancel_order(order_id: int, db: AsyncSession):
+    order = await get_order_by_id(order_id, db)
     if not order:
         return False
     
@@ -47,15 +121,17 @@ def cancel_order(order_id: int, db: Session):
         return False
     
     order.status = OrderStatus.CANCELLED
-    db.commit()
-    db.refresh(order)
+    await outbox.cancel_hold(order.id, db)
+    await db.commit()
+    await db.refresh(order)
+    await events.publish_order_change(order.id, db)
     return order
 
 
 #update order status
 
-def update_order_status(order_id: int, new_status: OrderStatusUpdate, db: Session):
-    order = get_order_by_id(order_id, db)
+async def update_order_status(order_id: int, new_status: OrderStatusUpdate, db: AsyncSession):
+    order = await get_order_by_id(order_id, db)
     if not order:
         return False
     
@@ -63,9 +139,14 @@ def update_order_status(order_id: int, new_status: OrderStatusUpdate, db: Sessio
         return False
     
     order.status = new_status.status
-    db.commit()
-    db.refresh(order)
+    if order.status == OrderStatus.DELIVERED:
+        #release funds from escrow once the status change is committed
+        outbox.enqueue_release(order.id, db)
+    elif order.status == OrderStatus.CANCELLED:
+        await outbox.cancel_hold(order.id, db)
 
-    return order
+    await db.commit()
+    await db.refresh(order)
+    await events.publish_order_change(order.id, db)
 
-    
\ No newline at end of file
+    return order
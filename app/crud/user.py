@@ -1,37 +1,65 @@
 # from fastapi import 
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app import schema
 from app import models
+from app.cache import invalidate_principal, invalidate_token_version
+from app.loader import load
+from app.projection import paginate_rows, select_for
 
-def create_user(payload: schema.UserCreate, db: Session):
+# changing any of these makes tokens carrying the old values invalid
+TOKEN_CLAIM_FIELDS = ("email", "role")
+
+async def create_user(payload: schema.UserCreate, db: AsyncSession):
     new_user = models.User(**payload.model_dump())
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
     return new_user
 
-def get_user(user_id: int, db: Session):
-    return db.query(models.User).filter(models.User.id == user_id).first()
+async def get_user(user_id: int, db: AsyncSession):
+    return await load(db, models.User, user_id)
+
+# the user's version for ETags, without loading the row
+async def get_user_version(user_id: int, db: AsyncSession):
+    return await db.scalar(select(models.User.updated_at).filter(models.User.id == user_id))
+
+# read-only rows of the schema.User columns, never reads hashed_password. Ends the session's current transaction
+async def get_users(cursor: str | None, limit: int, db: AsyncSession):
+    return await paginate_rows(db, select_for(models.User, schema.User), [models.User.id], cursor, limit)
 
-def get_users(skip: int, limit: int, db: Session):
-    return db.query(models.User).offset(skip).limit(limit).all()
-def update_user(user_id: int, payload: schema.UserUpdate, db: Session):
-    user = get_user(user_id, db)
+async def update_user(user_id: int, payload: schema.UserUpdate, db: AsyncSession):
+    user = await get_user(user_id, db)
+    old_email = user.email
     
     user_dict = payload.model_dump(exclude_unset=True)
 
+    if any(k in TOKEN_CLAIM_FIELDS and getattr(user, k) != v for k, v in user_dict.items()):
+        bump_token_version(user)
+
     for k, v in user_dict.items():
         setattr(user, k, v)
     
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    invalidate_principal(old_email, user.email)
+    invalidate_token_version(user.id)
+    await db.refresh(user)
     return user
 
-def delete_user(user_id: int, db: Session):
-    user = get_user(user_id, db)
-    db.delete(user)
-    db.commit()
+async def delete_user(user_id: int, db: AsyncSession):
+    user = await get_user(user_id, db)
+    await db.delete(user)
+    await db.commit()
+    invalidate_principal(user.email)
+    invalidate_token_version(user.id)
     return user
 
-def get_user_email(email: str, db: Session):
-    return db.query(models.User).filter(models.User.email == email).first()
\ No newline at end of file
+async def get_user_email(email: str, db: AsyncSession):
+    return await db.scalar(select(models.User).filter(models.User.email == email))
+
+async def get_token_version(user_id: int, db: AsyncSession):
+    return await db.scalar(select(models.User.token_version).filter(models.User.id == user_id))
+
+# revokes every token issued to the user so far, committed by the caller
+def bump_token_version(user: models.User):
+    user.token_version = (user.token_version or 0) + 1
@@ -1,22 +1,136 @@
+import asyncio
 import os
-from sqlalchemy import create_engine
+import time
+from sqlalchemy import exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from dotenv import load_dotenv
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# connection pool settings
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+# connections opened at startup, so the first requests don't pay for the connects
+DB_POOL_WARMUP = int(os.getenv("DB_POOL_WARMUP", str(DB_POOL_SIZE)))
+DB_WARMUP_TIMEOUT = float(os.getenv("DB_WARMUP_TIMEOUT", "5"))
+DB_PING_TIMEOUT = float(os.getenv("DB_PING_TIMEOUT", "2"))
+
+
+# alembic keeps using the sync (psycopg2) url from the environment,
+# the application itself talks to postgres through asyncpg
+def get_async_database_url(database_url: str):
+    url = make_url(database_url)
+    if url.drivername in ("postgresql", "postgresql+psycopg2"):
+        url = url.set(drivername="postgresql+asyncpg")
+    return url
+
+
+class PoolStats:
+    """Process-wide counters for connection checkouts.
+
+    Kept outside the pool itself so the numbers survive engine.dispose(),
+    which swaps the pool for a fresh instance.
+    """
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    def record_wait(self, seconds: float):
+        self.checkouts += 1
+        self.wait_time_total += seconds
+        self.wait_time_max = max(self.wait_time_max, seconds)
+
+
+pool_stats = PoolStats()
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    # _do_get is where a checkout blocks when the pool is exhausted,
+    # so timing it gives the queueing delay requests actually see
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            pool_stats.timeouts += 1
+            raise
+        finally:
+            pool_stats.record_wait(time.perf_counter() - start)
+
+
+engine = create_async_engine(
+    get_async_database_url(DATABASE_URL),
+    poolclass=InstrumentedPool,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=DB_POOL_PRE_PING,
+)
+SessionLocal = async_sessionmaker(bind=engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
 
 Base = declarative_base()
 
 # Dependency
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with SessionLocal() as db:
         yield db
+
+
+async def warm_up_pool(size: int = DB_POOL_WARMUP, timeout: float = DB_WARMUP_TIMEOUT):
+    """Open `size` connections at once and hand them back to the pool.
+
+    Never fails startup: if the database is slow or unreachable the worker still comes
+    up (not ready, see /ready) and connects on demand like it would without warm-up.
+    """
+    start = time.perf_counter()
+    opened = []
+
+    async def open_connection():
+        # every connection is held until all are open, otherwise the pool would hand
+        # the same one out again
+        opened.append(await engine.connect())
+
+    try:
+        await asyncio.wait_for(asyncio.gather(*(open_connection() for _ in range(size))), timeout)
+    except Exception as e:
+        print(f"Database pool warm-up incomplete, connecting on demand: {e!r}")
     finally:
-        db.close()
+        for conn in opened:
+            await conn.close()
+    print(f"Database pool warmed up with {len(opened)}/{size} connections in {(time.perf_counter() - start) * 1000:.0f}ms")
+
+
+async def ping(timeout: float = DB_PING_TIMEOUT):
+    async def select_one():
+        async with engine.connect() as conn:
+            await conn.exec_driver_sql("SELECT 1")
+
+    await asyncio.wait_for(select_one(), timeout)
+
+
+def get_pool_status():
+    pool = engine.pool
+    checkouts = pool_stats.checkouts
+    return {
+        "pool_size": pool.size(),
+        "max_overflow": DB_MAX_OVERFLOW,
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": max(pool.overflow(), 0),
+        "checkouts": checkouts,
+        "timeouts": pool_stats.timeouts,
+        "wait_time_avg_ms": round(pool_stats.wait_time_total / checkouts * 1000, 3) if checkouts else 0.0,
+        "wait_time_max_ms": round(pool_stats.wait_time_max * 1000, 3),
+    }
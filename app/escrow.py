@@ -0,0 +1,173 @@
+"""Escrow backends
+
+The outbox dispatcher talks to escrow through the EscrowBackend interface, picked
+with ESCROW_BACKEND:
+
+- "algorand" (default): the escrow smart contract, through the batching Algorand client
+- "simulated": an in-process ledger with configurable latency, failure rate and
+  confirmation delay, so the order -> delivery -> release flow can be run and
+  load-tested without an algod endpoint
+"""
+import asyncio
+import base64
+import os
+import random
+import time
+from abc import ABC, abstractmethod
+
+from algosdk.error import AlgodHTTPError
+from dotenv import load_dotenv
+
+from app import algorand_utils
+
+load_dotenv()
+
+ESCROW_BACKEND = os.getenv("ESCROW_BACKEND", "algorand").lower()
+ESCROW_SIM_LATENCY_MS = float(os.getenv("ESCROW_SIM_LATENCY_MS", "50"))
+ESCROW_SIM_FAILURE_RATE = float(os.getenv("ESCROW_SIM_FAILURE_RATE", "0"))
+ESCROW_SIM_CONFIRMATION_MS = float(os.getenv("ESCROW_SIM_CONFIRMATION_MS", "3000"))
+
+
+class EscrowError(Exception):
+    pass
+
+
+class EscrowAlreadyApplied(EscrowError):
+    """The operation was already carried out, by an earlier attempt whose outcome was lost."""
+
+    def __init__(self, message: str, tx_id: str | None = None):
+        super().__init__(message)
+        self.tx_id = tx_id
+
+
+class EscrowBackend(ABC):
+    @abstractmethod
+    async def hold(self, order_id: int, amount) -> str:
+        """Hold the order amount in escrow, returns the transaction id."""
+
+    @abstractmethod
+    async def release(self, order_id: int) -> str:
+        """Release the funds held for the order, returns the transaction id."""
+
+    async def ping(self):
+        """Raise if the escrow service can't be reached."""
+
+    async def close(self):
+        pass
+
+
+class AlgorandEscrowBackend(EscrowBackend):
+    # hold and release transactions carry a per-order lease, so algod rejects a
+    # resubmission once the first one landed instead of applying it twice
+    async def hold(self, order_id: int, amount):
+        try:
+            return await algorand_utils.get_escrow_batcher().hold(order_id, amount)
+        except AlgodHTTPError as e:
+            raise self._already_applied(e) or e
+
+    async def release(self, order_id: int):
+        try:
+            return await algorand_utils.get_escrow_batcher().release(order_id)
+        except AlgodHTTPError as e:
+            raise self._already_applied(e) or e
+
+    @staticmethod
+    def _already_applied(error: AlgodHTTPError):
+        message = str(error)
+        if "already in ledger" in message or "overlapping lease" in message:
+            return EscrowAlreadyApplied(message)
+
+    async def ping(self):
+        await algorand_utils.get_async_escrow_client().health()
+
+    async def close(self):
+        await algorand_utils.close_clients()
+
+
+class SimulatedEscrowBackend(EscrowBackend):
+    """In-memory escrow ledger.
+
+    Every call takes `latency_ms` (with +/-50% jitter) and fails with probability
+    `failure_rate`. A hold only confirms `confirmation_ms` after it was accepted and
+    releasing it waits for that, the way a release can't land before its hold's round.
+
+    The ledger lives in the process, while every worker runs its own outbox dispatcher,
+    so the hold for an order is often recorded by another worker than the one claiming
+    its release. A release with no local hold is treated as one held elsewhere: it
+    waits a full `confirmation_ms` and goes through, so multi-worker load tests run the
+    whole order -> delivery -> release flow.
+    """
+
+    def __init__(self, latency_ms: float = ESCROW_SIM_LATENCY_MS, failure_rate: float = ESCROW_SIM_FAILURE_RATE, confirmation_ms: float = ESCROW_SIM_CONFIRMATION_MS):
+        self.latency_ms = latency_ms
+        self.failure_rate = failure_rate
+        self.confirmation_ms = confirmation_ms
+        # order_id -> {"amount", "hold_tx", "confirmed_at", "release_tx"}
+        self.ledger = {}
+
+    async def _network_call(self):
+        await asyncio.sleep(self.latency_ms * random.uniform(0.5, 1.5) / 1000)
+        if random.random() < self.failure_rate:
+            raise EscrowError("Simulated escrow failure")
+
+    def _tx_id(self):
+        # same shape as an Algorand transaction id
+        return base64.b32encode(random.randbytes(32)).decode().rstrip("=")
+
+    async def hold(self, order_id: int, amount):
+        await self._network_call()
+        if order_id in self.ledger:
+            raise EscrowAlreadyApplied(f"Funds for order {order_id} are already held", self.ledger[order_id]["hold_tx"])
+
+        tx_id = self._tx_id()
+        self.ledger[order_id] = {
+            "amount": amount,
+            "hold_tx": tx_id,
+            "confirmed_at": time.monotonic() + self.confirmation_ms / 1000,
+            "release_tx": None,
+        }
+        return tx_id
+
+    async def release(self, order_id: int):
+        entry = self.ledger.get(order_id)
+        if entry is None:
+            # held by another worker's dispatcher, assume it was only just accepted
+            entry = self.ledger[order_id] = {
+                "amount": None,
+                "hold_tx": None,
+                "confirmed_at": time.monotonic() + self.confirmation_ms / 1000,
+                "release_tx": None,
+            }
+
+        pending = entry["confirmed_at"] - time.monotonic()
+        if pending > 0:
+            await asyncio.sleep(pending)
+
+        await self._network_call()
+        if entry["release_tx"] is not None:
+            raise EscrowAlreadyApplied(f"Funds for order {order_id} were already released", entry["release_tx"])
+
+        entry["release_tx"] = self._tx_id()
+        return entry["release_tx"]
+
+
+_backend = None
+
+
+def get_escrow_backend() -> EscrowBackend:
+    global _backend
+    if _backend is None:
+        if ESCROW_BACKEND == "simulated":
+            _backend = SimulatedEscrowBackend()
+        elif ESCROW_BACKEND == "algorand":
+            _backend = AlgorandEscrowBackend()
+        else:
+            raise ValueError(f"Unknown ESCROW_BACKEND {ESCROW_BACKEND!r}, expected 'algorand' or 'simulated'")
+    return _backend
+
+
+async def close_backend():
+    global _backend
+    if _backend is not None:
+        await _backend.close()
+        _backend = None
@@ -0,0 +1,32 @@
+"""Weak ETags and conditional GETs
+
+Read endpoints tag their responses with a weak ETag built from the rows' updated_at
+(or, for cached bodies, from the body itself). The version is read with a query that
+only touches the key and updated_at columns, so an If-None-Match that still matches is
+answered 304 before the full row is loaded or serialized. Paginated listings tag the page
+they fetched instead (keys and updated_at of its rows): a version read over the whole
+collection would cost as much as the unpaginated listing.
+"""
+import hashlib
+
+from fastapi import Request, Response, status
+
+
+def make_etag(*parts):
+    digest = hashlib.blake2b("|".join(map(str, parts)).encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+
+def etag_matches(request: Request, etag: str):
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, W/ prefixes don't matter
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in header.split(","))
+
+
+def not_modified(etag: str):
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
@@ -0,0 +1,184 @@
+"""Delivery change events
+
+Publishes "this delivery changed" notices keyed by the tracking code so GET
+/track-order/{tracking_id}/events can push updates instead of being polled. Messages only
+say what changed; subscribers re-read the delivery, so a dropped or merged message never
+leaves a client on stale data.
+
+The broker is picked with EVENTS_BROKER:
+
+- "local" (default): in-process fan-out, enough for a single worker
+- "postgres": LISTEN/NOTIFY on one dedicated connection per worker, so a change committed
+  by any worker (or the outbox dispatcher) reaches subscribers on all of them
+"""
+import asyncio
+import json
+import os
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from uuid import UUID
+
+import asyncpg
+from dotenv import load_dotenv
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models
+from app.cache import tracking_cache
+from app.database import DATABASE_URL, get_async_database_url
+from app.tracking import encode_tracking_id
+
+load_dotenv()
+
+EVENTS_BROKER = os.getenv("EVENTS_BROKER", "local").lower()
+# messages buffered per subscriber, a slow one loses the oldest (the next re-read catches up)
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "16"))
+EVENTS_PG_CHANNEL = os.getenv("EVENTS_PG_CHANNEL", "delivery_events")
+EVENTS_PG_RECONNECT_DELAY = float(os.getenv("EVENTS_PG_RECONNECT_DELAY", "5"))
+
+
+class Broker(ABC):
+    def __init__(self):
+        # channel -> queues of the subscribers in this worker
+        self._subscribers = defaultdict(set)
+
+    @asynccontextmanager
+    async def subscribe(self, channel: str):
+        queue = asyncio.Queue(maxsize=EVENTS_QUEUE_SIZE)
+        self._subscribers[channel].add(queue)
+        try:
+            yield queue
+        finally:
+            self._subscribers[channel].discard(queue)
+            if not self._subscribers[channel]:
+                del self._subscribers[channel]
+
+    def _deliver(self, channel: str, message: dict):
+        # changes published by other workers reach this one's tracking cache here
+        tracking_cache.invalidate(channel)
+        for queue in self._subscribers.get(channel, ()):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(message)
+
+    @abstractmethod
+    async def publish(self, channel: str, message: dict):
+        """Send the message to every subscriber of the channel."""
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+
+class LocalBroker(Broker):
+    async def publish(self, channel: str, message: dict):
+        self._deliver(channel, message)
+
+
+class PostgresBroker(Broker):
+    """Fans out through Postgres NOTIFY.
+
+    Every worker LISTENs on one connection outside the pool and delivers what it hears to
+    its own subscribers, including the notifications it sent itself. Publishing goes over
+    the same connection, serialized with a lock since asyncpg runs one query at a time.
+    """
+
+    def __init__(self, dsn: str):
+        super().__init__()
+        self.dsn = dsn
+        self._conn = None
+        self._lock = asyncio.Lock()
+        self._reconnect = None
+
+    async def start(self):
+        # the worker still starts while the database is unreachable, listening begins once it is back
+        try:
+            await self._connect()
+        except Exception as e:
+            print(f"Event broker could not connect, retrying: {e}")
+            self._schedule_reconnect()
+
+    async def _connect(self):
+        conn = await asyncpg.connect(self.dsn)
+        conn.add_termination_listener(self._on_terminate)
+        await conn.add_listener(EVENTS_PG_CHANNEL, self._on_notify)
+        self._conn = conn
+
+    def _on_notify(self, conn, pid, channel, payload):
+        event = json.loads(payload)
+        self._deliver(event["channel"], event["message"])
+
+    def _on_terminate(self, conn):
+        print("Event broker connection lost, reconnecting")
+        self._conn = None
+        self._schedule_reconnect()
+
+    def _schedule_reconnect(self):
+        if self._reconnect is None or self._reconnect.done():
+            self._reconnect = asyncio.get_running_loop().create_task(self._reconnect_loop())
+
+    async def _reconnect_loop(self):
+        while self._conn is None:
+            await asyncio.sleep(EVENTS_PG_RECONNECT_DELAY)
+            try:
+                await self._connect()
+            except Exception as e:
+                print(f"Event broker reconnect failed: {e}")
+
+    async def publish(self, channel: str, message: dict):
+        payload = json.dumps({"channel": channel, "message": message})
+        async with self._lock:
+            if self._conn is None:
+                raise ConnectionError("Event broker is not connected")
+            await self._conn.execute("SELECT pg_notify($1, $2)", EVENTS_PG_CHANNEL, payload)
+
+    async def close(self):
+        if self._reconnect is not None:
+            self._reconnect.cancel()
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            conn.remove_termination_listener(self._on_terminate)
+            await conn.close()
+
+
+_broker = None
+
+
+def get_broker() -> Broker:
+    global _broker
+    if _broker is None:
+        if EVENTS_BROKER == "local":
+            _broker = LocalBroker()
+        elif EVENTS_BROKER == "postgres":
+            url = get_async_database_url(DATABASE_URL).set(drivername="postgresql")
+            _broker = PostgresBroker(url.render_as_string(hide_password=False))
+        else:
+            raise ValueError(f"Unknown EVENTS_BROKER {EVENTS_BROKER!r}, expected 'local' or 'postgres'")
+    return _broker
+
+
+async def close_broker():
+    global _broker
+    if _broker is not None:
+        await _broker.close()
+        _broker = None
+
+
+# Called after the change is committed. A lost event only delays a push until the client
+# reconnects, so failures are logged rather than failing the request that made the change
+async def publish_delivery_change(tracking_id: UUID, order_id: int):
+    key = encode_tracking_id(tracking_id)
+    tracking_cache.invalidate(key)
+    try:
+        await get_broker().publish(key, {"order_id": order_id})
+    except Exception as e:
+        print(f"Publishing delivery event for {key} failed: {e}")
+
+
+async def publish_order_change(order_id: int, db: AsyncSession):
+    tracking_id = await db.scalar(select(models.Delivery.tracking_id).filter(models.Delivery.order_id == order_id))
+    if tracking_id:
+        await publish_delivery_change(tracking_id, order_id)
@@ -0,0 +1,171 @@
+"""Password hashing
+
+bcrypt is deliberately slow and holds the GIL for most of its run, so hashing and
+verification run in a dedicated, size-limited process pool instead of the event loop
+or the shared threadpool. Once HASH_POOL_WORKERS + HASH_QUEUE_SIZE operations are in
+flight, further ones fail fast with a 503 rather than queueing behind a login storm.
+A pool broken by a worker dying is replaced and the operation retried once.
+
+The bcrypt cost is calibrated at startup to the smallest one that takes at least
+BCRYPT_TARGET_MS on this machine (or pinned with BCRYPT_ROUNDS). Stored hashes made
+with a lower cost are upgraded on the next successful login; stronger ones are left
+alone, so workers or nodes that calibrate one round apart don't keep rehashing the
+same password back and forth. Set BCRYPT_ROUNDS to give a whole fleet the same cost.
+"""
+import asyncio
+import math
+import multiprocessing
+import os
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from dotenv import load_dotenv
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+load_dotenv()
+
+HASH_POOL_WORKERS = int(os.getenv("HASH_POOL_WORKERS", str(os.cpu_count() or 1)))
+# hashes allowed to wait for a free worker before new ones are rejected
+HASH_QUEUE_SIZE = int(os.getenv("HASH_QUEUE_SIZE", "32"))
+BCRYPT_TARGET_MS = float(os.getenv("BCRYPT_TARGET_MS", "250"))
+BCRYPT_ROUNDS = os.getenv("BCRYPT_ROUNDS")
+BCRYPT_CALIBRATION_PROBES = int(os.getenv("BCRYPT_CALIBRATION_PROBES", "5"))
+
+BCRYPT_DEFAULT_ROUNDS = 12
+BCRYPT_MIN_ROUNDS = 10
+BCRYPT_MAX_ROUNDS = 16
+
+
+def _make_context(rounds: int):
+    # min_rounds makes needs_update() flag weaker hashes, stronger ones are kept
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds,
+    )
+
+
+pwd_context = _make_context(BCRYPT_DEFAULT_ROUNDS)
+bcrypt_rounds = BCRYPT_DEFAULT_ROUNDS
+
+_executor = None
+_in_flight = 0
+
+
+# also the worker initializer, so every process hashes with the same cost
+def _set_rounds(new_rounds: int):
+    global pwd_context, bcrypt_rounds
+    pwd_context = _make_context(new_rounds)
+    bcrypt_rounds = new_rounds
+
+
+def calibrate_rounds(target_ms: float, probes: int = BCRYPT_CALIBRATION_PROBES):
+    """Smallest bcrypt cost whose hash takes at least `target_ms` here.
+
+    Each extra round doubles the work, so hashes timed at the minimum cost are
+    enough to extrapolate. The median of several keeps one hash slowed down by a
+    busy cold start from picking a cost too low.
+    """
+    probe = _make_context(BCRYPT_MIN_ROUNDS)
+    timings = []
+    for _ in range(max(probes, 1)):
+        start = time.perf_counter()
+        probe.hash("calibration")
+        timings.append(time.perf_counter() - start)
+    elapsed_ms = max(statistics.median(timings) * 1000, 0.001)
+
+    extra_rounds = max(math.ceil(math.log2(target_ms / elapsed_ms)), 0)
+    return min(BCRYPT_MIN_ROUNDS + extra_rounds, BCRYPT_MAX_ROUNDS)
+
+
+# called once from the app lifespan, before the first hash
+def configure():
+    if BCRYPT_ROUNDS:
+        new_rounds = int(BCRYPT_ROUNDS)
+    else:
+        new_rounds = calibrate_rounds(BCRYPT_TARGET_MS)
+        print(f"bcrypt cost calibrated to {new_rounds} rounds (target {BCRYPT_TARGET_MS:g}ms)")
+    _set_rounds(new_rounds)
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        # spawn rather than fork, the parent is a running event loop with threads
+        _executor = ProcessPoolExecutor(
+            max_workers=HASH_POOL_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_set_rounds,
+            initargs=(bcrypt_rounds,),
+        )
+    return _executor
+
+
+def _replace_broken_executor(broken: ProcessPoolExecutor):
+    global _executor
+    # calls that failed on the same pool at once only replace it once
+    if _executor is broken:
+        _executor = None
+        broken.shutdown(wait=False, cancel_futures=True)
+
+
+# executed inside the worker processes
+def _hash(password: str):
+    return pwd_context.hash(password)
+
+
+def _verify(password: str, hashed_password: str):
+    return pwd_context.verify(password, hashed_password)
+
+
+async def _run(fn, *args):
+    global _in_flight
+    if _in_flight >= HASH_POOL_WORKERS + HASH_QUEUE_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many authentication requests in progress, please retry shortly",
+            headers={"Retry-After": "1"},
+        )
+
+    _in_flight += 1
+    try:
+        # a worker that dies (OOM kill, crash) breaks the whole pool for good, so start
+        # a new one and retry once instead of failing every later hash
+        for _ in range(2):
+            executor = _get_executor()
+            try:
+                return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+            except BrokenProcessPool:
+                print("Password hashing pool broke, starting a new one")
+                _replace_broken_executor(executor)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Authentication is temporarily unavailable, please retry shortly",
+            headers={"Retry-After": "1"},
+        )
+    finally:
+        _in_flight -= 1
+
+
+async def hash_password(password: str):
+    return await _run(_hash, password)
+
+
+async def verify_password(password: str, hashed_password: str):
+    return await _run(_verify, password, hashed_password)
+
+
+# only parses the stored hash, cheap enough for the event loop
+def needs_rehash(hashed_password: str):
+    return pwd_context.needs_update(hashed_password)
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
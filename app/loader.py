@@ -0,0 +1,12 @@
+"""Request-scoped entity loading
+
+get_db is resolved once per request, so a router and the crud functions it calls share
+one AsyncSession and with it the session's identity map. Loading by primary key through
+here looks in that map first: a row the router already read for a 404 or ownership check
+is handed to the crud function without another SELECT.
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+async def load(db: AsyncSession, model, pk, *options):
+    return await db.get(model, pk, options=options)
@@ -1,14 +1,32 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response, status
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from app.router import auth, user, kyc, order, delivery, delivery_status
-from app import models
+from app.router import auth, user, kyc, order, delivery, delivery_status, admin
+from app import database, hashing, outbox, escrow, events, metrics
 from app.database import engine
 
-models.Base.metadata.create_all(bind=engine)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # the schema is managed by Alembic (alembic upgrade head), workers only connect
+    hashing.configure()
+    await database.warm_up_pool()
+    await events.get_broker().start()
+    if outbox.OUTBOX_DISPATCHER_ENABLED:
+        outbox.dispatcher.start()
+    yield
+    await outbox.dispatcher.stop()
+    await escrow.close_backend()
+    await events.close_broker()
+    hashing.shutdown()
+    await engine.dispose()
+    metrics.shutdown()
 
 origins = ["*"]
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -17,6 +35,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(metrics.MetricsMiddleware)
 
 app.include_router(auth.router)
 app.include_router(delivery_status.router)
@@ -24,8 +43,27 @@ app.include_router(user.router)
 app.include_router(kyc.router)
 app.include_router(order.router)
 app.include_router(delivery.router)
+app.include_router(admin.router)
 
 
 @app.get('/')
 def root():
     return {'message': 'Fortescrow API!'}
+
+
+# readiness probe, 503 until the database and escrow service both answer
+@app.get('/ready')
+async def ready():
+    checks = {'database': database.ping(), 'escrow': escrow.get_escrow_backend().ping()}
+    results = await asyncio.gather(*checks.values(), return_exceptions=True)
+    report = {name: 'ok' if result is None else repr(result) for name, result in zip(checks, results)}
+
+    if any(result != 'ok' for result in report.values()):
+        return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content={'status': 'unavailable', 'checks': report})
+    return {'status': 'ready', 'checks': report}
+
+
+@app.get('/metrics', include_in_schema=False)
+def get_metrics():
+    content, media_type = metrics.render()
+    return Response(content=content, media_type=media_type)
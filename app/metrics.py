@@ -0,0 +1,155 @@
+"""Prometheus metrics
+
+Served at GET /metrics:
+
+- http_request_duration_seconds / http_requests_total: per route template (not the raw
+  path, so ids don't blow up the label set) and status code
+- db_query_duration_seconds / db_queries_per_request: every statement the engine runs,
+  labelled with the route of the request that ran it ("background" for the outbox
+  dispatcher and other work outside a request)
+- db_pool_connections: checked in / checked out / overflow connections of the pool
+- escrow_request_duration_seconds / escrow_errors_total: escrow hold and release calls
+
+With several worker processes each keeps its own values, so a scrape would only see
+the worker that answered it. Set PROMETHEUS_MULTIPROC_DIR to an empty directory shared
+by the workers (cleared before they start) and every worker writes its values there and
+/metrics aggregates all of them.
+"""
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest, multiprocess
+from sqlalchemy import event
+
+from app.database import engine, get_pool_status
+
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Time until the response headers are sent, so streamed bodies don't count their lifetime",
+    ["method", "route"],
+)
+HTTP_REQUESTS = Counter("http_requests_total", "Responses sent", ["method", "route", "status"])
+
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds",
+    "Statement execution time",
+    ["route"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request",
+    "Statements run while serving one request",
+    ["route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50, 100),
+)
+DB_POOL_CONNECTIONS = Gauge("db_pool_connections", "Connections in the pool", ["state"], multiprocess_mode="livesum")
+
+ESCROW_REQUEST_DURATION = Histogram(
+    "escrow_request_duration_seconds",
+    "Escrow backend call time",
+    ["operation"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+ESCROW_ERRORS = Counter("escrow_errors_total", "Failed escrow backend calls", ["operation"])
+
+
+class RequestStats:
+    def __init__(self, scope):
+        self.scope = scope
+        self.queries = 0
+
+    @property
+    def route(self):
+        # FastAPI stores the matched route in the scope once routing is done
+        route = self.scope.get("route")
+        return route.path if route is not None else "unmatched"
+
+
+_request_stats: ContextVar[RequestStats | None] = ContextVar("request_stats", default=None)
+
+
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_start = time.perf_counter()
+
+
+@event.listens_for(engine.sync_engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._query_start
+    stats = _request_stats.get()
+    if stats is None:
+        DB_QUERY_DURATION.labels("background").observe(elapsed)
+        return
+    stats.queries += 1
+    DB_QUERY_DURATION.labels(stats.route).observe(elapsed)
+
+
+class MetricsMiddleware:
+    # plain ASGI rather than BaseHTTPMiddleware, which would buffer streaming responses
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats(scope)
+        token = _request_stats.set(stats)
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                HTTP_REQUEST_DURATION.labels(scope["method"], stats.route).observe(time.perf_counter() - start)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_stats.reset(token)
+            route = stats.route
+            HTTP_REQUESTS.labels(scope["method"], route, str(status_code)).inc()
+            DB_QUERIES_PER_REQUEST.labels(route).observe(stats.queries)
+            observe_pool()
+
+
+def observe_pool():
+    pool = get_pool_status()
+    DB_POOL_CONNECTIONS.labels("checked_in").set(pool["checked_in"])
+    DB_POOL_CONNECTIONS.labels("checked_out").set(pool["checked_out"])
+    DB_POOL_CONNECTIONS.labels("overflow").set(pool["overflow"])
+
+
+@contextmanager
+def track_escrow(operation: str):
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        ESCROW_ERRORS.labels(operation).inc()
+        raise
+    finally:
+        ESCROW_REQUEST_DURATION.labels(operation).observe(time.perf_counter() - start)
+
+
+def render():
+    """The exposition body and its content type."""
+    observe_pool()
+    if PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def shutdown():
+    # drops this worker's live gauges from the aggregate once it exits
+    if PROMETHEUS_MULTIPROC_DIR:
+        multiprocess.mark_process_dead(os.getpid())
@@ -1,9 +1,9 @@
 # import enum
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Enum, DECIMAL
+from sqlalchemy import Boolean, Column, ForeignKey, Index, Integer, String, Enum, DECIMAL, Uuid, func
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql.sqltypes import TIMESTAMP
 from sqlalchemy.sql.expression import text
-from app.schema import UserRole, OrderStatus, KYCStatus, DocumentType, EscrowStatus
+from app.schema import UserRole, OrderStatus, KYCStatus, DocumentType, EscrowStatus, EscrowOperation, OutboxStatus
 
 
 from app.database import Base
@@ -22,6 +22,10 @@ class User(Base):
     is_verified = Column(Boolean, default=False)  # Indicates KYC verification
     # Could be "buyer", "seller", "admin"
     role = Column(Enum(UserRole), nullable=False, default=UserRole.BUYER)
+    # Bumped whenever previously issued tokens must stop being accepted
+    token_version = Column(Integer, nullable=False, default=0, server_default=text('0'))
+    # Set on every UPDATE, read endpoints derive their ETags from it
+    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text('now()'), onupdate=func.now())
 
     # KYC Relationship
     kyc = relationship("KYC", back_populates="user", uselist=False)
@@ -34,7 +38,7 @@ class KYC(Base):
     __tablename__ = "kyc"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
+    user_id = Column(Integer, ForeignKey("users.id"), unique=True, index=True)
     # "pending", "verified", "rejected"
     kyc_status = Column(Enum(KYCStatus), nullable=False, default=KYCStatus.PENDING)
     # E.g., "NIN", "driver's license", "Passport"
@@ -42,9 +46,15 @@ class KYC(Base):
     document_id = Column(String, nullable=False)
     uploaded_at = Column(TIMESTAMP(timezone=True),
                          nullable=False, server_default=text('now()'))
+    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text('now()'), onupdate=func.now())
 
     user = relationship("User", back_populates="kyc")
 
+    __table_args__ = (
+        # admin review listings by status, in id (page) order
+        Index("ix_kyc_status_id", "kyc_status", "id"),
+    )
+
 
 class Order(Base):
     __tablename__ = "orders"
@@ -58,25 +68,57 @@ class Order(Base):
     status = Column(Enum(OrderStatus), default=OrderStatus.PENDING)
     created_at = Column(TIMESTAMP(timezone=True),
                         nullable=False, server_default=text('now()'))
+    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text('now()'), onupdate=func.now())
 
     user = relationship("User", back_populates="orders")
     delivery = relationship("Delivery", back_populates="order")
 
+    # match the (created_at, id) page order so listings are index scans that stop at the limit
+    __table_args__ = (
+        Index("ix_orders_user_id_created_at", "user_id", "created_at", "id"),
+        Index("ix_orders_created_at", "created_at", "id"),
+    )
+
 
 class Delivery(Base):
     __tablename__ = "deliveries"
 
     id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(Integer, ForeignKey("orders.id"))
-    tracking_id = Column(String, unique=True, nullable=False)
+    order_id = Column(Integer, ForeignKey("orders.id"), unique=True, index=True)
+    # UUIDv7, shown to customers as a short code (app.tracking)
+    tracking_id = Column(Uuid, unique=True, nullable=False)
     escrow_status = Column(Enum(EscrowStatus), default=EscrowStatus.FUNDS_HELD)
     delivery_address = Column(String, nullable=False)
     delivery_date = Column(TIMESTAMP(timezone=True), nullable=True)
     created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text('now()'))
+    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text('now()'), onupdate=func.now())
 
     order = relationship("Order", back_populates="delivery")
 
 
+# Escrow calls waiting to be sent to Algorand, written in the same transaction
+# as the order change that requires them and drained by app.outbox
+class EscrowOutbox(Base):
+    __tablename__ = "escrow_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
+    operation = Column(Enum(EscrowOperation), nullable=False)
+    amount = Column(DECIMAL(10, 2), nullable=True)
+    status = Column(Enum(OutboxStatus), nullable=False, default=OutboxStatus.PENDING)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text('now()'))
+    tx_id = Column(String, nullable=True)
+    last_error = Column(String, nullable=True)
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text('now()'))
+
+    __table_args__ = (
+        Index("ix_escrow_outbox_due", "next_attempt_at", postgresql_where=text("status = 'PENDING'")),
+        # releases look up their order's hold before they are claimed
+        Index("ix_escrow_outbox_order_id", "order_id", "operation"),
+    )
+
+
 # class Escrow(Base):
 #     __tablename__ = "escrows"
 
@@ -3,13 +3,16 @@ import os
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, Header, Request
 # from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from dotenv import load_dotenv
 from app.utils import get_user
+from app.hashing import hash_password, needs_rehash, verify_password
 from app.database import get_db
+from app.cache import principal_cache, token_version_cache
+from app.crud import user as user_crud
+from app import schema
 
 load_dotenv()
 
@@ -19,7 +22,6 @@ ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv('ACCESS_TOKEN_EXPIRE_MINUTES'))
 
 
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 # oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
 def get_token(authorization: str = Header(...)):
@@ -28,17 +30,33 @@ def get_token(authorization: str = Header(...)):
     return authorization.split(" ")[1]
 
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
-
-
-def authenticate_user(db: Session, credential: str, password: str):
-    user = get_user(credential, db)
-    if not user or not verify_password(password, user.hashed_password):
+async def authenticate_user(db: AsyncSession, credential: str, password: str):
+    user = await get_user(credential, db)
+    if not user or not await verify_password(password, user.hashed_password):
         return False
+
+    # transparently move the stored hash to the current bcrypt cost
+    if needs_rehash(user.hashed_password):
+        try:
+            user.hashed_password = await hash_password(password)
+            await db.commit()
+        except HTTPException:
+            # hashing pool is saturated, the upgrade can wait for the next login
+            pass
     return user
 
 
+# claims that let get_current_user authorize a request without loading the user;
+# `ver` is checked on every request
+def token_claims(user) -> dict:
+    return {
+        "sub": user.email,
+        "uid": user.id,
+        "role": user.role.value,
+        "ver": user.token_version,
+    }
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -70,8 +88,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
 #     return user
 
 ##for front-end request json type
-def get_current_user(request: Request, db: Session = Depends(get_db)):
-    print("Executing get_current_user...") 
+async def get_current_user(request: Request, db: AsyncSession = Depends(get_db)) -> schema.Principal:
     credentials_exception = HTTPException(
         status_code=401,
         detail="Could not validate credentials",
@@ -92,8 +109,36 @@ def get_current_user(request: Request, db: Session = Depends(get_db)):
     except JWTError:
         raise credentials_exception
     
-    user = get_user(credential=username, db=db)
+    user_id = payload.get("uid")
+    token_version = payload.get("ver")
+    if user_id is not None and token_version is not None:
+        current_version = token_version_cache.get(user_id)
+        if current_version is None:
+            current_version = await user_crud.get_token_version(user_id, db)
+            if current_version is None:
+                raise credentials_exception
+            token_version_cache.set(user_id, current_version)
+
+        if current_version != token_version:
+            raise credentials_exception
+
+        # the token was signed by us, no need to re-validate its claims
+        return schema.Principal.model_construct(
+            id=user_id,
+            email=username,
+            role=schema.UserRole(payload.get("role")),
+            is_active=True,
+        )
+
+    # tokens issued before the claims above existed resolve through the principal cache
+    principal = principal_cache.get(username)
+    if principal is not None:
+        return principal
+
+    user = await get_user(credential=username, db=db)
     if user is None:
         raise credentials_exception
     
-    return user
+    principal = schema.Principal.model_validate(user)
+    principal_cache.set(username, principal)
+    return principal
@@ -0,0 +1,264 @@
+"""Transactional outbox for escrow operations
+
+Orders never call Algorand inside a request. create_order and update_order_status
+add an EscrowOutbox row in the same transaction as the order change, and the
+dispatcher below submits those rows in the background.
+
+Each pass claims a batch of due rows by pushing their next_attempt_at forward by a
+lease (FOR UPDATE SKIP LOCKED, so several workers can run a dispatcher side by side),
+calls the escrow backend with bounded concurrency and no database connection held
+(on Algorand, concurrent calls are submitted as atomic groups by the escrow batcher),
+and records each outcome as soon as its call returns. Failed calls are retried with
+exponential backoff until OUTBOX_MAX_ATTEMPTS; a hold that never succeeds cancels its
+order.
+
+A release is only claimed once its order's hold is done, and fails without being sent
+if that hold failed. Cancelling an order fails its hold if it hasn't been sent yet.
+
+Delivery is still at-least-once: a worker stopping between a call and its write
+leaves the row to be claimed again after the lease. Backends report a resubmitted
+operation that already took effect as EscrowAlreadyApplied, which counts as done, so
+a retry never fails (or cancels) an order whose funds are held.
+"""
+import asyncio
+import os
+import random
+from datetime import datetime, timedelta, timezone
+
+from dotenv import load_dotenv
+from sqlalchemy import exists, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from app import events, models
+from app.escrow import EscrowAlreadyApplied, get_escrow_backend
+from app.database import SessionLocal
+from app.metrics import track_escrow
+from app.schema import EscrowOperation, EscrowStatus, OrderStatus, OutboxStatus
+
+load_dotenv()
+
+OUTBOX_DISPATCHER_ENABLED = os.getenv("OUTBOX_DISPATCHER_ENABLED", "true").lower() in ("1", "true", "yes")
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "1"))
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "50"))
+# calls in flight at once; the escrow batcher packs them into groups of up to 16
+OUTBOX_CONCURRENCY = int(os.getenv("OUTBOX_CONCURRENCY", "64"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+OUTBOX_BACKOFF_BASE = float(os.getenv("OUTBOX_BACKOFF_BASE", "2"))
+OUTBOX_BACKOFF_MAX = float(os.getenv("OUTBOX_BACKOFF_MAX", "300"))
+# how long a claimed row stays invisible to other dispatchers
+OUTBOX_LEASE = float(os.getenv("OUTBOX_LEASE", "60"))
+
+
+def enqueue_hold(order: models.Order, db: AsyncSession):
+    db.add(models.EscrowOutbox(order_id=order.id, operation=EscrowOperation.HOLD, amount=order.price))
+
+
+def enqueue_holds(orders, db: AsyncSession):
+    db.add_all(models.EscrowOutbox(order_id=order.id, operation=EscrowOperation.HOLD, amount=order.price) for order in orders)
+
+
+def enqueue_release(order_id: int, db: AsyncSession):
+    db.add(models.EscrowOutbox(order_id=order_id, operation=EscrowOperation.RELEASE))
+
+
+async def cancel_hold(order_id: int, db: AsyncSession):
+    # the order is gone, a hold that wasn't sent yet must never be
+    await db.execute(
+        update(models.EscrowOutbox)
+        .filter(
+            models.EscrowOutbox.order_id == order_id,
+            models.EscrowOutbox.operation == EscrowOperation.HOLD,
+            models.EscrowOutbox.status == OutboxStatus.PENDING,
+        )
+        .values(status=OutboxStatus.FAILED, last_error="Order cancelled before its escrow hold was sent")
+    )
+
+
+# the order's hold rows, for releases that have to wait for them
+Hold = aliased(models.EscrowOutbox)
+
+
+def _order_hold(*criteria):
+    return exists().where(
+        Hold.order_id == models.EscrowOutbox.order_id,
+        Hold.operation == EscrowOperation.HOLD,
+        *criteria,
+    )
+
+
+def backoff_delay(attempts: int):
+    delay = min(OUTBOX_BACKOFF_BASE * 2 ** (attempts - 1), OUTBOX_BACKOFF_MAX)
+    # jitter keeps retries of a failed batch from arriving at algod together
+    return delay * random.uniform(0.5, 1.0)
+
+
+class OutboxDispatcher:
+    def __init__(self, session_factory=SessionLocal):
+        self.session_factory = session_factory
+        self._semaphore = asyncio.Semaphore(OUTBOX_CONCURRENCY)
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                processed = await self.dispatch_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Escrow outbox dispatch failed: {e}")
+                processed = 0
+
+            # keep draining while there is a backlog, otherwise poll
+            if processed < OUTBOX_BATCH_SIZE:
+                await asyncio.sleep(OUTBOX_POLL_INTERVAL)
+
+    async def dispatch_once(self):
+        entries = await self._claim()
+        if not entries:
+            return 0
+
+        await asyncio.gather(*(self._process(entry) for entry in entries))
+        return len(entries)
+
+    async def _process(self, entry):
+        # written back right away, one slow call doesn't hold the batch's tx ids hostage
+        await self._record([await self._submit(entry)])
+
+    async def _claim(self):
+        # releases of funds that were never held fail instead of retrying forever
+        orphaned = (
+            update(models.EscrowOutbox)
+            .filter(
+                models.EscrowOutbox.status == OutboxStatus.PENDING,
+                models.EscrowOutbox.operation == EscrowOperation.RELEASE,
+                _order_hold(Hold.status == OutboxStatus.FAILED),
+            )
+            .values(status=OutboxStatus.FAILED, last_error="Escrow hold failed, nothing to release")
+            .execution_options(synchronize_session=False)
+        )
+        due = (
+            select(models.EscrowOutbox.id)
+            .filter(
+                models.EscrowOutbox.status == OutboxStatus.PENDING,
+                models.EscrowOutbox.next_attempt_at <= func.now(),
+                # a release waits until its order's hold is done
+                or_(
+                    models.EscrowOutbox.operation == EscrowOperation.HOLD,
+                    ~_order_hold(Hold.status != OutboxStatus.DONE),
+                ),
+            )
+            .order_by(models.EscrowOutbox.id)
+            .limit(OUTBOX_BATCH_SIZE)
+            .with_for_update(skip_locked=True)
+        )
+        claim = (
+            update(models.EscrowOutbox)
+            .filter(models.EscrowOutbox.id.in_(due))
+            .values(
+                attempts=models.EscrowOutbox.attempts + 1,
+                next_attempt_at=func.now() + timedelta(seconds=OUTBOX_LEASE),
+            )
+            .returning(
+                models.EscrowOutbox.id,
+                models.EscrowOutbox.order_id,
+                models.EscrowOutbox.operation,
+                models.EscrowOutbox.amount,
+                models.EscrowOutbox.attempts,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        async with self.session_factory() as db:
+            await db.execute(orphaned)
+            entries = (await db.execute(claim)).all()
+            await db.commit()
+        return entries
+
+    async def _submit(self, entry):
+        async with self._semaphore:
+            try:
+                escrow = get_escrow_backend()
+                with track_escrow(entry.operation.value):
+                    if entry.operation == EscrowOperation.HOLD:
+                        tx_id = await escrow.hold(entry.order_id, entry.amount)
+                    else:
+                        tx_id = await escrow.release(entry.order_id)
+                return entry, tx_id, None
+            except EscrowAlreadyApplied as e:
+                print(f"Escrow {entry.operation.value} for order {entry.order_id} already applied: {e}")
+                return entry, e.tx_id, None
+            except Exception as e:
+                return entry, None, str(e) or type(e).__name__
+
+    async def _record(self, results):
+        # deliveries whose state changed, announced once the outcome is committed
+        changed = []
+        async with self.session_factory() as db:
+            for entry, tx_id, error in results:
+                if error is None:
+                    tracking_id = await self._mark_done(entry, tx_id, db)
+                elif entry.attempts >= OUTBOX_MAX_ATTEMPTS:
+                    tracking_id = await self._mark_failed(entry, error, db)
+                else:
+                    retry_at = datetime.now(timezone.utc) + timedelta(seconds=backoff_delay(entry.attempts))
+                    await db.execute(
+                        update(models.EscrowOutbox)
+                        .filter(models.EscrowOutbox.id == entry.id)
+                        .values(next_attempt_at=retry_at, last_error=error)
+                    )
+                    tracking_id = None
+                if tracking_id:
+                    changed.append((tracking_id, entry.order_id))
+            await db.commit()
+
+        for tracking_id, order_id in changed:
+            await events.publish_delivery_change(tracking_id, order_id)
+
+    async def _mark_done(self, entry, tx_id: str, db: AsyncSession):
+        print(f"Escrow {entry.operation.value} transaction ID for order {entry.order_id}: {tx_id}")
+        await db.execute(
+            update(models.EscrowOutbox)
+            .filter(models.EscrowOutbox.id == entry.id)
+            .values(status=OutboxStatus.DONE, tx_id=tx_id, last_error=None)
+        )
+        if entry.operation == EscrowOperation.RELEASE:
+            return await db.scalar(
+                update(models.Delivery)
+                .filter(models.Delivery.order_id == entry.order_id)
+                .values(escrow_status=EscrowStatus.FUNDS_RELEASED)
+                .returning(models.Delivery.tracking_id)
+            )
+
+    async def _mark_failed(self, entry, error: str, db: AsyncSession):
+        print(f"Escrow {entry.operation.value} for order {entry.order_id} failed after {entry.attempts} attempts: {error}")
+        await db.execute(
+            update(models.EscrowOutbox)
+            .filter(models.EscrowOutbox.id == entry.id)
+            .values(status=OutboxStatus.FAILED, last_error=error)
+        )
+        if entry.operation == EscrowOperation.HOLD:
+            # no funds were ever held, the order can't go ahead
+            cancelled = await db.scalar(
+                update(models.Order)
+                .filter(models.Order.id == entry.order_id, models.Order.status == OrderStatus.PENDING)
+                .values(status=OrderStatus.CANCELLED)
+                .returning(models.Order.id)
+            )
+            if cancelled:
+                return await db.scalar(select(models.Delivery.tracking_id).filter(models.Delivery.order_id == entry.order_id))
+
+
+dispatcher = OutboxDispatcher()
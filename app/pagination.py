@@ -0,0 +1,81 @@
+"""Keyset (cursor) pagination
+
+List endpoints page with an opaque `cursor` instead of `skip`. A query is ordered by a
+unique key (e.g. (created_at, id) or id) and each page continues strictly after the last
+row of the previous one, so deep pages cost the same as the first and rows inserted
+meanwhile don't shift what a client has already seen.
+
+The cursor is the url-safe base64 of the last row's key values as JSON.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from fastapi import HTTPException, Query, status
+from sqlalchemy import BigInteger, DateTime, Integer, tuple_
+
+MAX_PAGE_SIZE = 1000
+# postgres integer columns, larger values are rejected by the driver
+INT4_MIN, INT4_MAX = -2**31, 2**31 - 1
+
+
+# shared by every paginated endpoint
+def page_params(cursor: str | None = None, limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE)):
+    return cursor, limit
+
+
+def encode_cursor(values):
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, keys):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(keys):
+            raise ValueError(cursor)
+        return [decode_value(key, value) for key, value in zip(keys, values)]
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+# the cursor comes from the client, every value has to match its column's type
+def decode_value(key, value):
+    if isinstance(key.type, DateTime):
+        return datetime.fromisoformat(value)
+    if isinstance(key.type, Integer):
+        if not isinstance(value, int) or isinstance(value, bool):
+            raise ValueError(value)
+        if not isinstance(key.type, BigInteger) and not INT4_MIN <= value <= INT4_MAX:
+            raise ValueError(value)
+    return value
+
+
+def after_cursor(stmt, keys, cursor: str | None):
+    if not cursor:
+        return stmt
+    values = decode_cursor(cursor, keys)
+    if len(keys) == 1:
+        return stmt.filter(keys[0] > values[0])
+    return stmt.filter(tuple_(*keys) > tuple_(*values))
+
+
+def page_statement(stmt, keys, cursor: str | None, limit: int):
+    # one extra row tells whether there is a next page
+    return after_cursor(stmt, keys, cursor).order_by(*keys).limit(limit + 1)
+
+
+async def paginate(db, stmt, keys, cursor: str | None, limit: int):
+    """Run `stmt` for one page ordered by `keys`, returns {"items", "next_cursor"}."""
+    items = (await db.scalars(page_statement(stmt, keys, cursor, limit))).all()
+    return make_page(items, keys, limit)
+
+
+def make_page(items, keys, limit: int):
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor([getattr(items[-1], key.key) for key in keys])
+    return {"items": items, "next_cursor": next_cursor}
@@ -0,0 +1,48 @@
+"""ORM-free read path for list endpoints
+
+Admin listings only need the columns their response schema shows. These helpers select
+exactly those columns with a Core select() and hand back the named-tuple rows, so no
+mapped instances are built, nothing enters an identity map and columns like
+users.hashed_password are never read. The schemas validate the rows with
+from_attributes like they would ORM objects.
+
+Queries run on the request's own session, in a READ ONLY transaction, and the
+connection goes back to the pool as soon as the rows are fetched. Using the session
+rather than a second pooled connection matters: a request already holding one for its
+auth lookup and waiting on another can deadlock the pool under load.
+
+That means ending the session's current transaction first. It is committed, so
+anything the request already flushed is kept, and a session with changes it has not
+flushed is refused instead of having them committed behind its back.
+"""
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.pagination import make_page, page_statement
+
+
+def columns_for(model, response_schema):
+    """The mapped columns of `model` that `response_schema` has fields for."""
+    return [getattr(model, name) for name in response_schema.model_fields]
+
+
+def select_for(model, response_schema):
+    return select(*columns_for(model, response_schema))
+
+
+async def fetch_rows(db: AsyncSession, stmt):
+    if db.new or db.dirty or db.deleted:
+        raise RuntimeError("Commit or roll back the session's pending changes before a read-only listing")
+    # READ ONLY can only be chosen when a transaction begins, so end the one the
+    # request's earlier lookups opened and read in a fresh one
+    await db.commit()
+    conn = await db.connection(execution_options={"postgresql_readonly": True})
+    rows = (await conn.execute(stmt)).all()
+    await db.commit()
+    return rows
+
+
+async def paginate_rows(db: AsyncSession, stmt, keys, cursor: str | None, limit: int):
+    """Same page shape as pagination.paginate, with rows instead of ORM objects."""
+    rows = await fetch_rows(db, page_statement(stmt, keys, cursor, limit))
+    return make_page(rows, keys, limit)
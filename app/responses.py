@@ -0,0 +1,53 @@
+"""Fast serialization path for list responses
+
+With FAST_JSON_RESPONSES enabled, list endpoints skip FastAPI's response_model
+handling (validation through the schema, jsonable_encoder, stdlib json) and build the
+body here instead: items are validated by a TypeAdapter compiled once at import, reading
+attributes straight off ORM objects or row tuples, and the page is encoded with orjson.
+
+The output matches the default path: Decimal prices as strings, aware timestamps with a
+trailing Z for UTC, enums as their values. The response_model stays on each route for
+the OpenAPI schema.
+"""
+import os
+from decimal import Decimal
+from typing import List
+
+import orjson
+from dotenv import load_dotenv
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from app import schema
+
+load_dotenv()
+
+FAST_JSON_RESPONSES = os.getenv("FAST_JSON_RESPONSES", "false").lower() in ("1", "true", "yes")
+
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+class ORJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_UTC_Z)
+
+
+ORDER_LIST = TypeAdapter(List[schema.Order])
+USER_LIST = TypeAdapter(List[schema.User])
+KYC_LIST = TypeAdapter(List[schema.KYC])
+
+
+# returns the page unchanged (for response_model) unless the fast path is enabled. Headers
+# already set on the route's injected `response` are carried over to the fast response
+def page_response(adapter: TypeAdapter, page: dict, response: Response | None = None):
+    if not FAST_JSON_RESPONSES:
+        return page
+
+    items = adapter.validate_python(page["items"], from_attributes=True)
+    headers = dict(response.headers) if response is not None else None
+    return ORJSONResponse({"items": adapter.dump_python(items), "next_cursor": page["next_cursor"]}, headers=headers)
@@ -0,0 +1,104 @@
+import csv
+import io
+import json
+from datetime import datetime
+from decimal import Decimal
+from enum import Enum
+from uuid import UUID
+from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi.responses import StreamingResponse
+from app import schema, oauth2
+from app.cache import principal_cache, token_version_cache, tracking_cache
+from app.crud import order as order_crud
+from app.database import SessionLocal, get_pool_status
+from app.tracking import encode_tracking_id
+
+router = APIRouter(
+    tags=['Admin']
+)
+
+"""Admin Endpoints
+
+Operational views of the running worker. Every endpoint here is restricted to admin users.
+
+1. READ(GET) - Connection pool status
+Live checkout/overflow numbers of the database pool, plus cumulative checkout wait time and timeouts.
+
+2. READ(GET) - Cache statistics
+Size and hit/miss counters of this worker's in-process caches.
+
+3. READ(GET) - Orders export
+Every order (optionally created in [since, until)) with its delivery and escrow state, streamed as NDJSON or CSV.
+"""
+
+
+@router.get('/admin/pool', status_code=status.HTTP_200_OK, response_model=schema.PoolStatus)
+async def get_pool(current_user: schema.Principal = Depends(oauth2.get_current_user)):
+
+    if current_user.role != schema.UserRole.ADMIN:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to perform this action! Aborted.")
+
+    return get_pool_status()
+
+
+
+@router.get('/admin/caches', status_code=status.HTTP_200_OK, response_model=dict[str, schema.CacheStats])
+async def get_caches(current_user: schema.Principal = Depends(oauth2.get_current_user)):
+
+    if current_user.role != schema.UserRole.ADMIN:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to perform this action! Aborted.")
+
+    caches = {"principal": principal_cache, "token_version": token_version_cache, "tracking": tracking_cache}
+    return {
+        name: {"size": len(cache), "maxsize": cache.maxsize, "hits": cache.hits, "misses": cache.misses}
+        for name, cache in caches.items()
+    }
+
+
+EXPORT_FIELDS = [column.name for column in order_crud.EXPORT_COLUMNS]
+
+
+def export_value(value):
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, UUID):
+        return encode_tracking_id(value)
+    return value
+
+
+# the request's session is closed before the body is sent, so the export opens its own
+# and keeps that one connection for as long as the client is reading
+async def export_orders_body(format: schema.ExportFormat, since: datetime | None, until: datetime | None):
+    async with SessionLocal() as db:
+        if format == schema.ExportFormat.CSV:
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(EXPORT_FIELDS)
+            yield buffer.getvalue()
+
+        async for rows in order_crud.stream_orders_export(db, since, until):
+            if format == schema.ExportFormat.CSV:
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                writer.writerows([export_value(value) for value in row] for row in rows)
+                yield buffer.getvalue()
+            else:
+                yield "".join(json.dumps(dict(zip(EXPORT_FIELDS, map(export_value, row)))) + "\n" for row in rows)
+
+
+@router.get('/admin/export/orders', status_code=status.HTTP_200_OK)
+async def export_orders(format: schema.ExportFormat = schema.ExportFormat.NDJSON, since: datetime | None = None, until: datetime | None = None, current_user: schema.Principal = Depends(oauth2.get_current_user)):
+
+    if current_user.role != schema.UserRole.ADMIN:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to perform this action! Aborted.")
+
+    media_type = "text/csv" if format == schema.ExportFormat.CSV else "application/x-ndjson"
+    return StreamingResponse(
+        export_orders_body(format, since, until),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="orders.{format.value}"'},
+    )
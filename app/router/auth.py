@@ -1,8 +1,8 @@
 from fastapi import APIRouter, status, Depends, HTTPException
 # from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from app import models
-from app.oauth2 import pwd_context, authenticate_user, create_access_token, get_current_user, verify_password
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.oauth2 import authenticate_user, create_access_token, get_current_user, token_claims
+from app.hashing import hash_password, verify_password
 from app import schema
 from app.crud import user as user_crud
 from app.utils import validate_password, update_password
@@ -14,8 +14,8 @@ router = APIRouter(
 )
 
 @router.post('/auth/signup', status_code=status.HTTP_201_CREATED, response_model=schema.User)
-def signup(payload: schema.UserCreate, db: Session=Depends(get_db)):
-    user = user_crud.get_user_email(payload.email, db)
+async def signup(payload: schema.UserCreate, db: AsyncSession=Depends(get_db)):
+    user = await user_crud.get_user_email(payload.email, db)
     if user:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
@@ -30,27 +30,27 @@ def signup(payload: schema.UserCreate, db: Session=Depends(get_db)):
             detail=password_validation_message
         )
     
-    password_hash = pwd_context.hash(payload.hashed_password)
+    password_hash = await hash_password(payload.hashed_password)
     payload.hashed_password = password_hash
 
-    new_user = user_crud.create_user(payload, db)
+    new_user = await user_crud.create_user(payload, db)
     return new_user
 
 @router.post('/auth/login', status_code=status.HTTP_202_ACCEPTED)
-def login(form_data: schema.LoginForm, db: Session=Depends(get_db)):
-    user = authenticate_user(db, form_data.username, form_data.password)
+async def login(form_data: schema.LoginForm, db: AsyncSession=Depends(get_db)):
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail='Incorrect username or password',
             headers={'WWW-Authenticate': 'Bearer'}
         )
-    access_token = create_access_token(data={"sub": user.email})
+    access_token = create_access_token(data=token_claims(user))
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.put('/auth/password_reset', status_code=status.HTTP_202_ACCEPTED)
-def password_reset(payload: schema.PasswordReset, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    user = user_crud.get_user_email(email=payload.email, db=db)
+async def password_reset(payload: schema.PasswordReset, db: AsyncSession = Depends(get_db), current_user: schema.Principal = Depends(get_current_user)):
+    user = await user_crud.get_user_email(email=payload.email, db=db)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -78,12 +78,12 @@ def password_reset(payload: schema.PasswordReset, db: Session = Depends(get_db),
             detail=password_check
         )
     
-    if verify_password(payload.new_password, user.hashed_password):
+    if await verify_password(payload.new_password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Password is too weak. Similar to old password"
         )
     
     
-    update_password(payload, db)
-    return {"details": "Password has been changed successfully!"}
\ No newline at end of file
+    await update_password(payload, db)
+    return {"details": "Password has been changed successfully!"}
\ No newline at end of file
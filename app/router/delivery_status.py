@@ -1,22 +1,114 @@
-from fastapi import APIRouter, HTTPException, status, Depends
-from sqlalchemy.orm import Session
+import asyncio
+from fastapi import APIRouter, HTTPException, status, Depends, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 # from typing import List
 from app.crud import delivery as dev_crud
-from app import schema, oauth2, models
-from app.database import get_db
+from app import schema, oauth2, events
+from app.cache import tracking_cache
+from app.database import get_db, SessionLocal
+from app.etag import etag_matches, make_etag, not_modified
+from app.tracking import encode_tracking_id, parse_tracking_id
 
 router = APIRouter(
     tags=['Track Order']
 )
 
+# comment line sent when nothing changed for this long, keeps proxies from closing the stream
+HEARTBEAT_INTERVAL = 15
+
+# short code or, for links issued before short codes, the UUID text -> the short code
+# that keys the tracking cache and the delivery events. None if it is neither
+def tracking_key(tracking_id: str):
+    parsed = parse_tracking_id(tracking_id)
+    return encode_tracking_id(parsed) if parsed else None
+
+
+# read-through tracking cache, returns the DeliveryResponse JSON or None for an unknown tracking id
+async def get_tracking_json(key: str, db: AsyncSession):
+    cached = tracking_cache.get(key)
+    if cached is not None:
+        return cached
+
+    generation = tracking_cache.generation
+    delivery = await dev_crud.get_delivery_status(parse_tracking_id(key), db)
+    if not delivery:
+        return None
+
+    tracking_json = schema.DeliveryResponse.model_validate(delivery).model_dump_json()
+    if tracking_cache.generation == generation:
+        tracking_cache.set(key, tracking_json)
+    return tracking_json
+
+
 @router.get('/track-order/{tracking_id}', status_code=status.HTTP_200_OK, response_model=schema.DeliveryResponse)
-def get_delivery_status(tracking_id: str, db: Session = Depends(get_db), current_user: models.User = Depends(oauth2.get_current_user)):
+async def get_delivery_status(tracking_id: str, request: Request, db: AsyncSession = Depends(get_db), current_user: schema.Principal = Depends(oauth2.get_current_user)):
 
-    order_tracker = dev_crud.get_delivery_status(tracking_id, db)
+    key = tracking_key(tracking_id)
+    order_tracker = key and await get_tracking_json(key, db)
     if not order_tracker:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Incorrect tracking ID"
         )
     
-    return order_tracker
\ No newline at end of file
+    # tagged from the cached body itself, a matching poll costs neither a query nor serialization
+    etag = make_etag(order_tracker)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    # already serialized through DeliveryResponse
+    return Response(content=order_tracker, media_type="application/json", headers={"ETag": etag})
+
+
+def delivery_event(tracking_json: str):
+    return f"event: delivery\ndata: {tracking_json}\n\n"
+
+
+# nothing changes after a cancellation or once the escrow of a delivered order is released
+def is_final(tracking_json: str):
+    delivery = schema.DeliveryResponse.model_validate_json(tracking_json)
+    if delivery.order.status == schema.OrderStatus.CANCELLED:
+        return True
+    return delivery.order.status == schema.OrderStatus.DELIVERED and delivery.escrow_status == schema.EscrowStatus.FUNDS_RELEASED
+
+
+# reads the current state only after subscribing so no change can slip in between, then
+# re-reads the delivery on every notice. The request's session is closed while streaming,
+# each read takes a connection just for that one query
+async def delivery_events(key: str):
+    async with events.get_broker().subscribe(key) as queue:
+        while True:
+            async with SessionLocal() as db:
+                tracking_json = await get_tracking_json(key, db)
+            if not tracking_json:
+                return
+            yield delivery_event(tracking_json)
+            if is_final(tracking_json):
+                return
+
+            while True:
+                try:
+                    await asyncio.wait_for(queue.get(), HEARTBEAT_INTERVAL)
+                    break
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+
+
+#push delivery changes as server-sent events instead of polling /track-order/{tracking_id}
+@router.get('/track-order/{tracking_id}/events', status_code=status.HTTP_200_OK)
+async def stream_delivery_status(tracking_id: str, db: AsyncSession = Depends(get_db), current_user: schema.Principal = Depends(oauth2.get_current_user)):
+
+    key = tracking_key(tracking_id)
+    order_tracker = key and await get_tracking_json(key, db)
+    if not order_tracker:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Incorrect tracking ID"
+        )
+
+    return StreamingResponse(
+        delivery_events(key),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
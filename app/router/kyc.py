@@ -1,9 +1,10 @@
-from fastapi import APIRouter, HTTPException, status, Depends
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, HTTPException, status, Depends, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
-from app import schema, models, oauth2, utils
-from app.crud import kyc as kyc_crud, user as user_crud
+from app.etag import etag_matches, make_etag, not_modified
+from app.pagination import page_params
+from app import schema, oauth2, utils, responses
+from app.crud import kyc as kyc_crud
 
 router = APIRouter(
     tags=['KYC Records']
@@ -25,6 +26,7 @@ This endpoint allows you to retrieve a USER KYC record by its USER ID. The user
 
 4. UPDATE(PUT) - Update a kyc record
 This endpoint allows you to update a KYC record by its ID. The user must be authenticated and have the necessary permissions.
+The bulk variant (PUT /kyc/bulk) applies a status to a list of KYC ids, or to every record in a given status. Admin users only.
 
 5. DELETE(DELETE) - Delete a kyc record
 This endpoint allows you to delete a KYC record by its ID if neccessary. The user must be authenticated and have the necessary permissions.
@@ -32,8 +34,8 @@ This endpoint allows you to delete a KYC record by its ID if neccessary. The use
 
 #creating a new record
 @router.post('/kyc', status_code=status.HTTP_201_CREATED, response_model=schema.KYC)
-def create_kyc_record(user_id: int, payload: schema.KYCCreate, db: Session = Depends(get_db), current_user: models.User = Depends(oauth2.get_current_user)):
-    user_kyc = kyc_crud.get_user_kyc_record(user_id, db)
+async def create_kyc_record(user_id: int, payload: schema.KYCCreate, db: AsyncSession = Depends(get_db), current_user: schema.Principal = Depends(oauth2.get_current_user)):
+    user_kyc = await kyc_crud.get_user_kyc_record(user_id, db)
     if user_kyc:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
@@ -44,41 +46,56 @@ def create_kyc_record(user_id: int, payload: schema.KYCCreate, db: Session = Dep
     if current_user.id != user_id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You don't have permission to create a KYC record for this user")
     
-    new_record = kyc_crud.create_kyc(user_id, payload, db)
+    new_record = await kyc_crud.create_kyc(user_id, payload, db)
     return new_record
 
 
 #retrieving all kyc records - allowing only admin users to access users' kyc record.
-@router.get('/kyc', status_code=status.HTTP_200_OK, response_model=List[schema.KYC])
-def get_all_kyc_records(skip: int = 0, limit: int = 10, db: Session = Depends(get_db), current_user: models.User = Depends(oauth2.get_current_user)):
+@router.get('/kyc', status_code=status.HTTP_200_OK, response_model=schema.Page[schema.KYC])
+async def get_all_kyc_records(page: tuple = Depends(page_params), db: AsyncSession = Depends(get_db), current_user: schema.Principal = Depends(oauth2.get_current_user)):
 
     admin = schema.UserRole.ADMIN
 
     if current_user.role != admin:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to perform this action! Aborted.")
     
-    all_records = kyc_crud.get_kyc_records(skip, limit, db)
-    return all_records
+    all_records = await kyc_crud.get_kyc_records(*page, db)
+    return responses.page_response(responses.KYC_LIST, all_records)
 
 #retrieving a record by user id
 @router.get('/kyc/{user_id}', status_code=status.HTTP_200_OK, response_model=schema.KYC)
-def get_user_kyc_record(user_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(oauth2.get_current_user)):
-    user = user_crud.get_user(user_id, db)
-    if not user:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
-    
-    if current_user.id != user.id:
+async def get_user_kyc_record(user_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_db), current_user: schema.Principal = Depends(oauth2.get_current_user)):
+    if current_user.id != user_id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to access this user's KYC record! Aborted.")
     
-    user_kyc = kyc_crud.get_user_kyc_record(user_id, db)
-    if not user_kyc:
+    version = await kyc_crud.get_user_kyc_version(user_id, db)
+    if not version:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User has no KYC record")
+
+    etag = make_etag("kyc", version.id, version.updated_at.isoformat())
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    user_kyc = await kyc_crud.get_user_kyc_record(user_id, db)
+    response.headers["ETag"] = etag
     return user_kyc
 
+#updating many kyc statuses at once - admin priviledge only, registered before /kyc/{kyc_id}
+@router.put('/kyc/bulk', status_code=status.HTTP_202_ACCEPTED, response_model=schema.KYCBulkUpdateResponse)
+async def update_kyc_statuses(payload: schema.KYCBulkUpdate, db: AsyncSession = Depends(get_db), current_user: schema.Principal = Depends(oauth2.get_current_user)):
+    admin = schema.UserRole.ADMIN
+
+    if current_user.role != admin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to perform this action! Aborted.")
+    
+    kyc_ids = await kyc_crud.update_kyc_statuses(payload.kyc_status, db, kyc_ids=payload.kyc_ids, current_status=payload.current_status)
+
+    return {"updated": len(kyc_ids), "kyc_ids": kyc_ids}
+
 #updating the kyc status - admin priviledge only
 @router.put('/kyc/{kyc_id}', status_code=status.HTTP_202_ACCEPTED)
-def update_kyc_status(kyc_id: int, payload: schema.KYCUpdate, db: Session = Depends(get_db), current_user: models.User = Depends(oauth2.get_current_user)):
-    kyc = kyc_crud.get_kyc_record(kyc_id, db)
+async def update_kyc_status(kyc_id: int, payload: schema.KYCUpdate, db: AsyncSession = Depends(get_db), current_user: schema.Principal = Depends(oauth2.get_current_user)):
+    kyc = await kyc_crud.get_kyc_record(kyc_id, db)
     if not kyc:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -90,14 +107,14 @@ def update_kyc_status(kyc_id: int, payload: schema.KYCUpdate, db: Session = Depe
     if current_user.role != admin:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to perform this action! Aborted.")
     
-    kyc_crud.update_kyc_status(kyc_id, payload, db)
+    await kyc_crud.update_kyc_status(kyc_id, payload, db)
 
     return { "detail": "KYC Status updated successfully!"}
 
 #delete kyc record
 @router.delete('/kyc{kyc_id}', status_code=status.HTTP_202_ACCEPTED)
-def delete_kyc_record(kyc_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(oauth2.get_current_user)):
-    kyc = kyc_crud.get_kyc_record(kyc_id, db)
+async def delete_kyc_record(kyc_id: int, db: AsyncSession = Depends(get_db), current_user: schema.Principal = Depends(oauth2.get_current_user)):
+    kyc = await kyc_crud.get_kyc_record(kyc_id, db)
     if not kyc:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -109,6 +126,6 @@ def delete_kyc_record(kyc_id: int, db: Session = Depends(get_db), current_user:
     if current_user.role != admin and current_user.id != kyc.user_id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to perform this action! Aborted.")
     
-    kyc_crud.delete_kyc_record(kyc_id, db)
+    await kyc_crud.delete_kyc_record(kyc_id, db)
 
-    return { "detail": "KYC record deleted successfully!"}
\ No newline at end of file
+    return { "detail": "KYC record deleted successfully!"}
@@ -1,10 +1,10 @@
-from fastapi import APIRouter, HTTPException, status, Depends
-from sqlalchemy.orm import Session
-from typing import List
-from app.crud import user as user_crud, order as order_crud
-from app.algorand_utils import release_escrow
-from app import schema, oauth2, models
+from fastapi import APIRouter, HTTPException, status, Depends, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.crud import order as order_crud
+from app import schema, oauth2, responses
 from app.database import get_db
+from app.etag import etag_matches, make_etag, not_modified
+from app.pagination import page_params
 
 router = APIRouter(
     tags=['Orders']
@@ -12,46 +12,61 @@ router = APIRouter(
 
 
 @router.post('/orders', status_code=status.HTTP_201_CREATED, response_model=schema.Order)
-def create_order(payload: schema.OrderCreate, db: Session = Depends(get_db), current_user: models.User = Depends(oauth2.get_current_user)):
-    new_order = order_crud.create_order(payload, current_user.id, db)
+async def create_order(payload: schema.OrderCreate, db: AsyncSession = Depends(get_db), current_user: schema.Principal = Depends(oauth2.get_current_user)):
+    new_order = await order_crud.create_order(payload, current_user.id, db)
     
     return new_order
 
 
-@router.get('/orders', status_code=status.HTTP_200_OK, response_model=List[schema.Order])
-def get_orders(skip: int = 0, limit: int = 10, db: Session = Depends(get_db), current_user: models.User = Depends(oauth2.get_current_user)):
+# registered ahead of the /orders/{...} routes
+@router.post('/orders/bulk', status_code=status.HTTP_207_MULTI_STATUS, response_model=schema.OrderBulkResponse)
+async def create_orders_bulk(payload: schema.OrderBulkCreate, db: AsyncSession = Depends(get_db), current_user: schema.Principal = Depends(oauth2.get_current_user)):
+    results = await order_crud.create_orders_bulk(payload.items, current_user.id, db)
+    created = sum(1 for result in results if result.error is None)
 
-    user = user_crud.get_user(current_user.id, db)
-    
-    if user.role != schema.UserRole.ADMIN:
+    return {"created": created, "failed": len(results) - created, "results": results}
+
+
+@router.get('/orders', status_code=status.HTTP_200_OK, response_model=schema.Page[schema.Order])
+async def get_orders(page: tuple = Depends(page_params), db: AsyncSession = Depends(get_db), current_user: schema.Principal = Depends(oauth2.get_current_user)):
+
+    if current_user.role != schema.UserRole.ADMIN:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized to perform this action! Aborted."
         )
     
-    all_orders = order_crud.get_orders(skip, limit, db)
-    return all_orders
+    all_orders = await order_crud.get_orders(*page, db)
+    return responses.page_response(responses.ORDER_LIST, all_orders)
 
-@router.get('/orders/{user_id}/orders', status_code=status.HTTP_200_OK, response_model=List[schema.Order])
-def get_user_orders(user_id: int, skip: int = 0, limit: int = 10, db: Session = Depends(get_db), current_user: models.User = Depends(oauth2.get_current_user)):
+@router.get('/orders/{user_id}/orders', status_code=status.HTTP_200_OK, response_model=schema.Page[schema.Order])
+async def get_user_orders(user_id: int, request: Request, response: Response, page: tuple = Depends(page_params), db: AsyncSession = Depends(get_db), current_user: schema.Principal = Depends(oauth2.get_current_user)):
 
     admin = schema.UserRole.ADMIN
-
-    user = user_crud.get_user(user_id, db)
     
-    if user.role != admin and current_user.id != user_id:
+    if current_user.role != admin and current_user.id != user_id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized to perform this action! Aborted."
         )
     
-    user_orders = order_crud.get_user_orders(user_id, skip, limit, db)
-    return user_orders
+    # tagged by the page's own rows, an order added or changed elsewhere in the history
+    # doesn't invalidate it and the tag costs no query beyond the page itself
+    user_orders = await order_crud.get_user_orders(user_id, *page, db)
+    etag = make_etag(
+        "orders", user_id, *page, user_orders["next_cursor"],
+        *(f"{row.id}:{row.updated_at.isoformat()}" for row in user_orders["items"]),
+    )
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    response.headers["ETag"] = etag
+    return responses.page_response(responses.ORDER_LIST, user_orders, response)
 
 #cancel order
 @router.put('/orders/{order_id}', status_code=status.HTTP_202_ACCEPTED)
-def cancel_order(order_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(oauth2.get_current_user)):
-    order = order_crud.get_order_by_id(order_id, db)
+async def cancel_order(order_id: int, db: AsyncSession = Depends(get_db), current_user: schema.Principal = Depends(oauth2.get_current_user)):
+    order = await order_crud.get_order_by_id(order_id, db)
     if not order:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -67,20 +82,20 @@ def cancel_order(order_id: int, db: Session = Depends(get_db), current_user: mod
     if order.status == schema.OrderStatus.CANCELLED:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Order is already cancelled.")
     
-    order_crud.cancel_order(order_id, db)
+    await order_crud.cancel_order(order_id, db)
 
     return {"detail": "Order canceled successfully!"}
 
 #update order status
 @router.put('/orders/status/{order_id}', status_code=status.HTTP_202_ACCEPTED, response_model=schema.Order)
-def update_order_status(order_id: int, new_status: schema.OrderStatusUpdate, db: Session = Depends(get_db), current_user: models.User = Depends(oauth2.get_current_user)):
+async def update_order_status(order_id: int, new_status: schema.OrderStatusUpdate, db: AsyncSession = Depends(get_db), current_user: schema.Principal = Depends(oauth2.get_current_user)):
     
     #defining roles for authorization check
     admin = schema.UserRole.ADMIN
     seller = schema.UserRole.SELLER
     
     #retrieving order to check if it exists
-    order = order_crud.get_order_by_id(order_id, db)
+    order = await order_crud.get_order_by_id(order_id, db)
     if not order:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -94,10 +109,7 @@ def update_order_status(order_id: int, new_status: schema.OrderStatusUpdate, db:
     if order.status == schema.OrderStatus.DELIVERED:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Order is already delivered.")
     
-    updated_order = order_crud.update_order_status(order.id, new_status, db)
-    if updated_order.status == schema.OrderStatus.DELIVERED:
-        #release funds from escrow
-        #call release_escrow function
-        release_escrow(order.id)
+    #delivered orders get their escrow release queued by the crud layer
+    updated_order = await order_crud.update_order_status(order.id, new_status, db)
 
-    return updated_order
\ No newline at end of file
+    return updated_order
@@ -1,9 +1,10 @@
-from fastapi import APIRouter, HTTPException, status, Depends
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, HTTPException, status, Depends, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.crud import user as user_crud
-from app import schema, oauth2, models
+from app import schema, oauth2, responses
 from app.database import get_db
+from app.etag import etag_matches, make_etag, not_modified
+from app.pagination import page_params
 
 router = APIRouter(
     tags=['Users']
@@ -20,26 +21,33 @@ DELETE USER - has admin privilege
 """
 
 
-@router.get('/users', status_code=status.HTTP_200_OK, response_model=List[schema.User])
-def get_users(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
-    users = user_crud.get_users(skip, limit, db)
-    return users
+@router.get('/users', status_code=status.HTTP_200_OK, response_model=schema.Page[schema.User])
+async def get_users(page: tuple = Depends(page_params), db: AsyncSession = Depends(get_db)):
+    users = await user_crud.get_users(*page, db)
+    return responses.page_response(responses.USER_LIST, users)
 
 
 @router.get('/users/{user_id}', status_code=status.HTTP_200_OK, response_model=schema.User)
-def get_single_user(user_id: int, db: Session = Depends(get_db)):
-    user = user_crud.get_user(user_id, db)
+async def get_single_user(user_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_db)):
+    version = await user_crud.get_user_version(user_id, db)
 
-    if not user:
+    if not version:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+
+    etag = make_etag("user", user_id, version.isoformat())
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    user = await user_crud.get_user(user_id, db)
+    response.headers["ETag"] = etag
     return user
 
 
 @router.put('/users/{user_id}', status_code=status.HTTP_202_ACCEPTED, response_model=schema.User)
-def update_user(user_id: int, payload: schema.UserUpdate, db: Session = Depends(get_db), current_user: models.User = Depends(oauth2.get_current_user)):
+async def update_user(user_id: int, payload: schema.UserUpdate, db: AsyncSession = Depends(get_db), current_user: schema.Principal = Depends(oauth2.get_current_user)):
 
-    user = user_crud.get_user(user_id, db)
+    user = await user_crud.get_user(user_id, db)
 
     if not user:
         raise HTTPException(
@@ -53,13 +61,13 @@ def update_user(user_id: int, payload: schema.UserUpdate, db: Session = Depends(
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
                             detail="Not authorized to update this user")
 
-    user_crud.update_user(user_id, payload, db)
+    await user_crud.update_user(user_id, payload, db)
     return user
 
 
 @router.delete('/users/{user_id}', status_code=status.HTTP_202_ACCEPTED)
-def delete_user(user_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(oauth2.get_current_user)):
-    user = user_crud.get_user(user_id, db)
+async def delete_user(user_id: int, db: AsyncSession = Depends(get_db), current_user: schema.Principal = Depends(oauth2.get_current_user)):
+    user = await user_crud.get_user(user_id, db)
 
     if not user:
         raise HTTPException(
@@ -71,5 +79,5 @@ def delete_user(user_id: int, db: Session = Depends(get_db), current_user: model
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
                             detail="Not authorized to delete this user")
 
-    user_crud.delete_user(user_id, db)
+    await user_crud.delete_user(user_id, db)
     return {"detail": "User deleted successfully!"}
@@ -1,12 +1,28 @@
 from enum import Enum
-from pydantic import BaseModel, ConfigDict, EmailStr
+from typing import Annotated, Any, Generic, List, Optional, TypeVar
+from uuid import UUID
+from pydantic import BaseModel, BeforeValidator, ConfigDict, EmailStr, Field, model_validator
 from datetime import datetime
 from decimal import Decimal
+from app.tracking import encode_tracking_id
 
 class EscrowStatus(str, Enum):
     FUNDS_HELD = "funds_held"
     FUNDS_RELEASED = "funds_released"
 
+class EscrowOperation(str, Enum):
+    HOLD = "hold"
+    RELEASE = "release"
+
+class ExportFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+class OutboxStatus(str, Enum):
+    PENDING = "pending"
+    DONE = "done"
+    FAILED = "failed"
+
 class UserRole(str, Enum):
     BUYER = "buyer"
     SELLER = "seller"
@@ -49,6 +65,16 @@ class User(UserBase):
 
     model_config = ConfigDict(from_attributes=True)
 
+# compact, session-independent snapshot of the authenticated user. KYC verification is
+# left out on purpose, it changes mid-session and is read from the users row when needed
+class Principal(BaseModel):
+    id: int
+    email: EmailStr
+    role: UserRole = UserRole.BUYER
+    is_active: bool = True
+
+    model_config = ConfigDict(from_attributes=True, frozen=True)
+
 class KYCBase(BaseModel):
    document_type: DocumentType = DocumentType.NIN
    document_id: str
@@ -59,6 +85,21 @@ class KYCCreate(KYCBase):
 class KYCUpdate(BaseModel):
     kyc_status: KYCStatus = KYCStatus.PENDING
 
+# applies kyc_status to the listed records, or to every record currently in current_status
+class KYCBulkUpdate(KYCUpdate):
+    kyc_ids: Optional[List[int]] = Field(None, min_length=1, max_length=10000)
+    current_status: Optional[KYCStatus] = None
+
+    @model_validator(mode="after")
+    def check_selection(self):
+        if self.kyc_ids is None and self.current_status is None:
+            raise ValueError("Provide kyc_ids or current_status to select the records to update")
+        return self
+
+class KYCBulkUpdateResponse(BaseModel):
+    updated: int
+    kyc_ids: List[int]
+
 class KYC(KYCBase):
     id: int
     user_id: int
@@ -83,9 +124,26 @@ class Order(OrderBase):
 
     model_config = ConfigDict(from_attributes=True)
 
+# items stay unvalidated here so one bad item fails on its own instead of rejecting the batch
+class OrderBulkCreate(BaseModel):
+    items: List[Any] = Field(min_length=1, max_length=1000)
+
+class OrderBulkItemResult(BaseModel):
+    index: int
+    order: Optional[Order] = None
+    error: Optional[str] = None
+
+class OrderBulkResponse(BaseModel):
+    created: int
+    failed: int
+    results: List[OrderBulkItemResult]
+
 class OrderStatusUpdate(BaseModel):
     status: OrderStatus = OrderStatus.PENDING
 
+# deliveries store the UUID, responses carry the customer-facing short code
+TrackingId = Annotated[str, BeforeValidator(lambda value: encode_tracking_id(value) if isinstance(value, UUID) else value)]
+
 class DeliveryCreate(BaseModel):
     delivery_address: str
     delivery_date: datetime = datetime.now()
@@ -93,7 +151,7 @@ class DeliveryCreate(BaseModel):
 class Delivery(BaseModel):
     id: int
     order_id: int
-    tracking_id: str
+    tracking_id: TrackingId
     delivery_address: str
     delivery_date: datetime = datetime.now()
     escrow_status: EscrowStatus = EscrowStatus.FUNDS_HELD
@@ -105,7 +163,7 @@ class DeliveryResponse(BaseModel):
     id: int
     order_id: int
     order: Order
-    tracking_id: str
+    tracking_id: TrackingId
     delivery_address: str
     delivery_date: datetime = datetime.now()
     escrow_status: EscrowStatus = EscrowStatus.FUNDS_HELD
@@ -124,6 +182,13 @@ class DeliveryResponse(BaseModel):
 
 #     model_config = ConfigDict(from_attributes=True)
 
+T = TypeVar("T")
+
+# one page of a keyset-paginated listing, pass next_cursor back to get the following page
+class Page(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None
+
 class PasswordReset(BaseModel):
     email: EmailStr
     new_password: str
@@ -133,6 +198,23 @@ class LoginForm(BaseModel):
     username: str
     password: str  # noqa: F821
 
+class PoolStatus(BaseModel):
+    pool_size: int
+    max_overflow: int
+    checked_in: int
+    checked_out: int
+    overflow: int
+    checkouts: int
+    timeouts: int
+    wait_time_avg_ms: float
+    wait_time_max_ms: float
+
+class CacheStats(BaseModel):
+    size: int
+    maxsize: int
+    hits: int
+    misses: int
+
 # Testing the classes
 
 # user = User(id=1, email="test@example.com", hashed_password="password", role=UserRole.BUYER)
@@ -1,26 +1,15 @@
 import re
-import uuid
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app import schema
+from app.cache import invalidate_principal, invalidate_token_version
 from app.crud import user as user_crud, order as order_crud
-
-from passlib.context import CryptContext
-
-# # Define the password hashing context
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-# def hash_password(password: str):
-#     return pwd_context.hash(password)
-
-# # verify hashed password for user authentication
-# def verify_hashed_password(password, hashed_password):
-#     return pwd_context.verify(password, hashed_password)
+from app.hashing import hash_password
+from app.tracking import uuid7
 
 
 # For authentication to know whether the user exists as a patient or doctor in database
-def get_user(credential: str, db: Session):
-    user = user_crud.get_user_email(credential, db)
+async def get_user(credential: str, db: AsyncSession):
+    user = await user_crud.get_user_email(credential, db)
     return user
 
 
@@ -46,8 +35,8 @@ def validate_password(password: str, first_name: str, last_name: str) -> str:
 
 
 
-def update_password(payload: schema.PasswordReset, db: Session):
-    user = user_crud.get_user_email(payload.email, db)
+async def update_password(payload: schema.PasswordReset, db: AsyncSession):
+    user = await user_crud.get_user_email(payload.email, db)
     if not user:
         return False
     
@@ -57,20 +46,23 @@ def update_password(payload: schema.PasswordReset, db: Session):
     if payload.new_password != payload.confirm_password:
         return False
     
-    hashed_password = pwd_context.hash(payload.new_password)
+    hashed_password = await hash_password(payload.new_password)
     user.hashed_password = hashed_password
+    user_crud.bump_token_version(user)
 
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    invalidate_principal(user.email)
+    invalidate_token_version(user.id)
+    await db.refresh(user)
     return user
 
-# logic to genearte tracking id 
+# logic to genearte tracking id, time ordered so deliveries append to the tracking index
 def generate_tracking_id():
-    return str(uuid.uuid4()) 
+    return uuid7()
 
 #logic to check order status
-def order_status_check(order_id: int, db: Session):
-    order = order_crud.get_order_by_id(order_id, db)
+async def order_status_check(order_id: int, db: AsyncSession):
+    order = await order_crud.get_order_by_id(order_id, db)
     if order.status == schema.OrderStatus.PENDING:
         return "This order has already been processed and pending"
     if order.status == schema.OrderStatus.IN_TRANSIT:
@@ -80,4 +72,4 @@ def order_status_check(order_id: int, db: Session):
     if order.status == schema.OrderStatus.CANCELLED:
         return "This order has been cancelled"
     return "continue" 
-        
\ No newline at end of file
+        
\ No newline at end of file
@@ -0,0 +1,55 @@
+"""Worker cold-start benchmark
+
+Starts fresh interpreters the way a new uvicorn worker would and times importing
+app.main and running the lifespan startup (everything before the first request is
+served). Uses the same environment as the app, so point DATABASE_URL at the database
+you want to measure against.
+
+    python scripts/bench_startup.py --runs 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORKER = """
+import asyncio, json, time
+start = time.perf_counter()
+from app.main import app
+imported = time.perf_counter()
+
+async def startup():
+    async with app.router.lifespan_context(app):
+        return time.perf_counter()
+
+ready = asyncio.run(startup())
+print(json.dumps({"import": imported - start, "startup": ready - imported, "total": ready - start}))
+"""
+
+
+def run_worker():
+    out = subprocess.run([sys.executable, "-c", WORKER], cwd=ROOT, capture_output=True, text=True)
+    if out.returncode != 0:
+        sys.exit(f"worker failed:\n{out.stderr}")
+    # the app prints its own startup lines, the timings are the last one
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    runs = [run_worker() for _ in range(args.runs)]
+    print(f"{args.runs} cold starts")
+    for phase in ("import", "startup", "total"):
+        times = [run[phase] * 1000 for run in runs]
+        print(f"{phase:>8}: min {min(times):7.1f}ms  median {statistics.median(times):7.1f}ms  max {max(times):7.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
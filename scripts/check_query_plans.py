@@ -0,0 +1,147 @@
+"""Query plan regression check
+
+Seeds a throwaway database with enough rows that the planner prefers indexes where
+they exist, runs the hot crud queries, and EXPLAINs the exact SQL they sent. Fails
+(exit code 1) when one of them no longer uses its index or falls back to a
+sequential scan of orders, kyc or deliveries.
+
+Needs a Postgres server; DATABASE_URL points at any database on it. The check
+creates its own `<database>_plan_check` database next to it and drops it afterwards,
+nothing in DATABASE_URL's database is touched.
+
+    python scripts/check_query_plans.py
+"""
+import asyncio
+import json
+import os
+import sys
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+load_dotenv(os.path.join(ROOT, ".env"))
+
+SERVER_URL = make_url(os.environ["DATABASE_URL"]).set(drivername="postgresql+asyncpg")
+CHECK_URL = SERVER_URL.set(database=f"{SERVER_URL.database}_plan_check")
+# app.database builds its engine from DATABASE_URL on import, nothing from app may be
+# imported before this points at the check database
+os.environ["DATABASE_URL"] = CHECK_URL.render_as_string(hide_password=False)
+
+from app import models, schema  # noqa: E402
+from app.crud import delivery as dev_crud, kyc as kyc_crud, order as order_crud  # noqa: E402
+from app.database import SessionLocal, engine  # noqa: E402
+
+USERS = 20000
+ORDERS = 200000
+DELIVERIES = 100000
+# tables a hot query must never read sequentially
+INDEXED_TABLES = {"orders", "kyc", "deliveries"}
+
+SEED = [
+    f"""INSERT INTO users (email, first_name, last_name, hashed_password, is_active, is_verified, role, token_version)
+        SELECT 'user' || g || '@example.com', 'First', 'Last', 'x', true, false, 'BUYER', 0
+        FROM generate_series(1, {USERS}) g""",
+    f"""INSERT INTO orders (user_id, item_name, quantity, price, status, created_at)
+        SELECT 1 + g % {USERS}, 'item', 1, 10,
+               (CASE WHEN g % 20 = 0 THEN 'PENDING' ELSE 'DELIVERED' END)::orderstatus,
+               now() - g * interval '1 minute'
+        FROM generate_series(1, {ORDERS}) g""",
+    """INSERT INTO kyc (user_id, kyc_status, document_type, document_id, uploaded_at)
+        SELECT id, (CASE WHEN id % 100 = 0 THEN 'PENDING' ELSE 'VERIFIED' END)::kycstatus, 'NIN', 'doc' || id, now()
+        FROM users""",
+    f"""INSERT INTO deliveries (order_id, tracking_id, escrow_status, delivery_address, created_at)
+        SELECT g, gen_random_uuid(), 'FUNDS_HELD', 'address', now()
+        FROM generate_series(1, {DELIVERIES}) g""",
+    "ANALYZE",
+]
+
+
+@contextmanager
+def captured_statements():
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", capture)
+    try:
+        yield statements
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", capture)
+
+
+def plan_nodes(plan):
+    yield plan
+    for child in plan.get("Plans", ()):
+        yield from plan_nodes(child)
+
+
+async def explain(statement, parameters):
+    async with engine.connect() as conn:
+        result = await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+        plan = result.scalar()
+    plan = json.loads(plan) if isinstance(plan, str) else plan
+    return list(plan_nodes(plan[0]["Plan"]))
+
+
+async def check(name, index, run):
+    """Run the crud call, one of the statements it sends must be planned with `index`."""
+    async with SessionLocal() as db:
+        with captured_statements() as statements:
+            await run(db)
+
+    nodes = [node for statement in statements for node in await explain(*statement)]
+    indexes = {node["Index Name"] for node in nodes if "Index Name" in node}
+    seq_scans = {node["Relation Name"] for node in nodes if node["Node Type"] == "Seq Scan"} & INDEXED_TABLES
+
+    ok = index in indexes and not seq_scans
+    detail = f"indexes {sorted(indexes)}" + (f", seq scan on {sorted(seq_scans)}" if seq_scans else "")
+    print(f"{'ok  ' if ok else 'FAIL'} {name}: expected {index}, {detail}")
+    return ok
+
+
+async def run_checks():
+    tracking_id = None
+    async with SessionLocal() as db:
+        tracking_id = await db.scalar(text(f"SELECT tracking_id FROM deliveries WHERE order_id = {DELIVERIES // 2}"))
+
+    checks = [
+        ("orders of a user", "ix_orders_user_id_created_at", lambda db: order_crud.get_user_orders(USERS // 2, None, 10, db)),
+        ("all orders", "ix_orders_created_at", lambda db: order_crud.get_orders(None, 10, db)),
+        ("kyc of a user", "ix_kyc_user_id", lambda db: kyc_crud.get_user_kyc_record(USERS // 2, db)),
+        ("kyc review by status", "ix_kyc_status_id", lambda db: kyc_crud.update_kyc_statuses(schema.KYCStatus.VERIFIED, db, current_status=schema.KYCStatus.PENDING)),
+        ("delivery of an order", "ix_deliveries_order_id", lambda db: dev_crud.get_delivery_by_order_id(DELIVERIES // 2, db)),
+        ("pending deliveries of an order", "ix_deliveries_order_id", lambda db: dev_crud.get_pending_delivery(DELIVERIES // 2, None, 10, db)),
+        ("in transit deliveries of an order", "ix_deliveries_order_id", lambda db: dev_crud.get_in_transit_delivery(DELIVERIES // 2, None, 10, db)),
+        ("tracking lookup", "deliveries_tracking_id_key", lambda db: dev_crud.get_delivery_status(tracking_id, db)),
+    ]
+    results = [await check(*args) for args in checks]
+    return all(results)
+
+
+async def main():
+    admin = create_async_engine(SERVER_URL, isolation_level="AUTOCOMMIT")
+    async with admin.connect() as conn:
+        await conn.execute(text(f'DROP DATABASE IF EXISTS "{CHECK_URL.database}"'))
+        await conn.execute(text(f'CREATE DATABASE "{CHECK_URL.database}"'))
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(models.Base.metadata.create_all)
+            for statement in SEED:
+                await conn.execute(text(statement))
+        passed = await run_checks()
+    finally:
+        await engine.dispose()
+        async with admin.connect() as conn:
+            await conn.execute(text(f'DROP DATABASE IF EXISTS "{CHECK_URL.database}"'))
+        await admin.dispose()
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())